@@ -3,11 +3,48 @@ from pydantic import BaseSettings
 
 class Settings(BaseSettings):
     rpc_endpoint_uri: str = ""
+    rpc_endpoints: dict[str, float] = {}
+    rpc_health_check_interval: float = 5
+    rpc_max_block_lag: int = 3
+    rpc_hedge_requests: bool = False
     max_verification_gas_limit: int = 200_000
     last_user_ops_count: int = 100
     min_max_fee_per_gas: int = 1
     min_max_priority_fee_per_gas: int = 1
     user_op_lifetime: int = 1800
+    max_pool_size: int = 10_000
+    max_pool_size_per_entry_point: int = 10_000
+    max_user_ops_per_sender: int = 4
+    min_replacement_fee_bump: int = 10
+    rate_limit_client_ip: float = 0
+    rate_limit_client_ip_burst: int = 20
+    rate_limit_sender: float = 0
+    rate_limit_sender_burst: int = 10
+    rate_limit_paymaster: float = 0
+    rate_limit_paymaster_burst: int = 100
+    rate_limit_factory: float = 0
+    rate_limit_factory_burst: int = 100
+    rate_limit_slots: int = 65536
+    reputation_flush_interval: int = 10
+    reputation_decay_interval: int = 3600
+    reputation_min_inclusion_rate_denominator: int = 10
+    reputation_throttling_slack: int = 10
+    reputation_ban_slack: int = 50
+    throttled_entity_mempool_count: int = 4
+    revalidation_poll_interval: float = 2
+    revalidation_max_blocks: int = 100
+    revalidation_concurrency: int = 8
+    rate_limit_shared_file: str = ""
+    bundle_gas_limit: int = 10_000_000
+    bundle_simulation_concurrency: int = 8
+    metrics_pool_size_interval: float = 10
+    simulation_concurrency: int = 16
+    simulation_queue_size: int = 64
+    simulation_target_latency: float = 1
+    call_simulation_concurrency: int = 64
+    call_simulation_queue_size: int = 256
+    restricted_opcodes_cache_size: int = 10_000
+    restricted_opcodes_flush_interval: int = 10
     environment: str = "APP"
     db_host: str = "localhost"
     db_user: str = ""
@@ -2,5 +2,9 @@ CALL_GAS = 9300
 MAX_TIMESTAMP = 4102433940  # 2099-12-31 23:59
 VALIDATION_RESULT_SIGNATURE = "e0cff05f"
 VALIDATION_RESULT_WITH_AGGREGATION_SIGNATURE = "faecb4e4"
+FAILED_OP_SIGNATURE = "220266b6"
+SIGNATURE_VALIDATION_FAILED_SIGNATURE = "86a9f750"
+DEPOSIT_TO_SIGNATURE = "b760faf9"
 DEPLOYED_CONTRACTS_JSON_DIR = "utils/deployments/"
 MAINNET_NAME = "gnosis"
+USER_OP_ABI_TYPE = "(address,uint256,bytes,bytes,uint256,uint256,uint256,uint256,uint256,bytes,bytes)"
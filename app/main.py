@@ -1,11 +1,23 @@
+import asyncio
 from datetime import datetime
+from typing import Optional
 
-from fastapi import Depends, FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
+from fastapi.exception_handlers import http_exception_handler
 from pydantic import BaseModel, validator
 from sqlalchemy.ext.asyncio import AsyncSession
+from web3 import Web3
 
 import app.constants as constants
 import db.service
+import utils.bytecode
+import utils.limiter
+import utils.metrics
+import utils.rate_limit
+import utils.request_stats
+import utils.reputation
+import utils.revalidation
+import utils.single_flight
 import utils.user_op
 import utils.web3
 from app.config import settings
@@ -16,6 +28,10 @@ from utils.validation import validate_address, validate_hex, validate_user_op
 class UserOp(utils.user_op.UserOp):
     _validate_address = validator("sender", allow_reuse=True)(validate_address)
 
+    @validator("sender")
+    def checksum_address(cls, v):
+        return Web3.toChecksumAddress(v)
+
     @validator(
         "nonce",
         "call_gas_limit",
@@ -86,12 +102,83 @@ class UserOpGasEstimation(BaseModel):
 
 
 app = FastAPI()
+background_tasks = []
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    background_tasks.append(asyncio.create_task(utils.reputation.run_flusher()))
+    background_tasks.append(
+        asyncio.create_task(utils.revalidation.run_revalidator())
+    )
+    background_tasks.append(asyncio.create_task(utils.bytecode.run_flusher()))
+    background_tasks.append(
+        asyncio.create_task(utils.metrics.run_pool_size_updater())
+    )
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for task in background_tasks:
+        task.cancel()
+
+
+@app.middleware("http")
+async def set_metrics_method(http_request: Request, call_next):
+    utils.metrics.method.set(http_request.url.path.rsplit("/", 1)[-1])
+    return await call_next(http_request)
+
+
+@app.middleware("http")
+async def account_request_stats(http_request: Request, call_next):
+    stats = utils.request_stats.start()
+    response = await call_next(http_request)
+    utils.request_stats.log(http_request.url.path, response.status_code, stats)
+    if utils.request_stats.DEBUG_HEADER in http_request.headers:
+        response.headers[
+            utils.request_stats.TIMING_HEADER
+        ] = stats.get_timing_header()
+    return response
+
+
+@app.exception_handler(HTTPException)
+async def count_rejection(http_request: Request, exc: HTTPException):
+    utils.metrics.count_rejection(exc.detail)
+    return await http_exception_handler(http_request, exc)
+
+
+@app.get("/metrics")
+async def metrics():
+    return Response(
+        utils.metrics.generate(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+def get_client_ip(http_request: Request) -> Optional[str]:
+    return http_request.client.host if http_request.client else None
 
 
 @app.post("/api/eth_sendUserOperation", response_model=str)
 async def send_user_operation(
-    request: SendRequest, session: AsyncSession = Depends(get_session)
+    request: SendRequest,
+    http_request: Request,
+    session: AsyncSession = Depends(get_session),
 ):
+    utils.rate_limit.check_user_op(request.user_op, get_client_ip(http_request))
+    # Retries of the same UserOp in flight wait for the first one's result
+    # instead of being simulated again
+    return await utils.single_flight.run(
+        utils.single_flight.get_user_op_key(
+            "eth_sendUserOperation", request.user_op, request.entry_point
+        ),
+        add_user_op,
+        session,
+        request,
+    )
+
+
+async def add_user_op(session: AsyncSession, request: SendRequest) -> str:
     await utils.validation.validate_entry_point(session, request.entry_point)
     entry_point = utils.web3.EntryPoint(request.entry_point)
     request.user_op.fill_hash(entry_point)
@@ -99,14 +186,25 @@ async def send_user_operation(
         simulation_result,
         is_trusted,
         helper_contracts_bytecode_hashes,
+        full_pools,
     ) = await validate_user_op(session, request.user_op, entry_point)
 
-    await db.service.delete_user_op_by_sender(session, request.user_op.sender)
-    user_op = await db.service.add_user_op(
+    await utils.validation.evict_user_ops(
+        session, request.user_op, entry_point.address, full_pools
+    )
+    user_op_id = await db.service.upsert_user_op(
         session,
         request.user_op,
-        entry_point=request.entry_point,
+        fee_bump=settings.min_replacement_fee_bump,
+        entry_point=entry_point.address,
         pre_op_gas=simulation_result.pre_op_gas,
+        aggregator=simulation_result.aggregator,
+        factory=utils.web3.get_address_from_first_20_bytes(
+            request.user_op.init_code
+        ),
+        paymaster=utils.web3.get_address_from_first_20_bytes(
+            request.user_op.paymaster_and_data
+        ),
         is_trusted=is_trusted,
         valid_after=datetime.fromtimestamp(simulation_result.valid_after),
         valid_until=datetime.fromtimestamp(
@@ -114,26 +212,50 @@ async def send_user_operation(
         ),
         expires_at=datetime.fromtimestamp(simulation_result.expires_at),
     )
+    if user_op_id is None:
+        raise utils.validation.insufficient_fee_bump_exception()
     await db.service.add_user_op_bytecodes(
-        session, user_op, helper_contracts_bytecode_hashes
+        session, user_op_id, helper_contracts_bytecode_hashes
     )
+    # Committed here, so the coalesced requests only succeed once it is stored
+    with utils.metrics.measure("commit"):
+        await session.commit()
 
     return request.user_op.hash
 
 
 @app.post("/api/eth_estimateUserOperationGas")
 async def estimate_user_op(
-    request: SendRequest, session: AsyncSession = Depends(get_session)
+    request: SendRequest,
+    http_request: Request,
+    session: AsyncSession = Depends(get_session),
 ):
+    utils.rate_limit.check_user_op(request.user_op, get_client_ip(http_request))
+    return await utils.single_flight.run(
+        utils.single_flight.get_user_op_key(
+            "eth_estimateUserOperationGas", request.user_op, request.entry_point
+        ),
+        get_user_op_gas_estimation,
+        session,
+        request,
+    )
+
+
+async def get_user_op_gas_estimation(
+    session: AsyncSession, request: SendRequest
+) -> UserOpGasEstimation:
     await utils.validation.validate_entry_point(session, request.entry_point)
     entry_point = utils.web3.EntryPoint(request.entry_point)
-    simulation_result = utils.validation.run_simulation(
-        request.user_op, entry_point
-    )
-    call_gas_limit = utils.web3.estimate_gas(
-        from_=entry_point.address,
-        to=request.user_op.sender,
-        data=request.user_op.call_data,
+    # The estimate never inspects opcodes, so the simulation is a plain
+    # eth_call and runs alongside the call gas estimation
+    simulation_result, call_gas_limit = await asyncio.gather(
+        utils.validation.simulate(request.user_op, entry_point, trace=False),
+        utils.limiter.get_simulation_limiter(utils.limiter.CALL).run(
+            utils.web3.estimate_gas,
+            from_=entry_point.address,
+            to=request.user_op.sender,
+            data=request.user_op.call_data,
+        ),
     )
     pre_verification_gas = request.user_op.get_calldata_gas()
 
@@ -0,0 +1,21 @@
+import pathlib
+
+import pytest
+
+BASELINE_STORAGE = pathlib.Path(__file__).parent / "baselines"
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    # Keep the saved runs next to the benchmarks so a baseline can be
+    # committed and compared against with --benchmark-compare
+    if config.option.benchmark_storage != "file://./.benchmarks":
+        return
+    config.option.benchmark_storage = f"file://{BASELINE_STORAGE}"
+
+    # pytest-benchmark only warns when there is nothing to compare against,
+    # which would let a regression check pass silently
+    if config.option.benchmark_compare and not any(
+        BASELINE_STORAGE.glob("**/[0-9][0-9][0-9][0-9]_*.json")
+    ):
+        raise pytest.UsageError(f"No benchmark baseline in {BASELINE_STORAGE}")
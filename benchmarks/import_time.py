@@ -0,0 +1,69 @@
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+import typer
+
+IMPORT_SCRIPT = """
+import resource, time
+started_at = time.perf_counter()
+import {module}
+print(time.perf_counter() - started_at)
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+cli = typer.Typer()
+
+
+def measure(module: str) -> (float, int, dict[str, int]):
+    process = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            IMPORT_SCRIPT.format(module=module),
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    import_time, max_rss = process.stdout.split()
+
+    # Lines look like "import time: self [us] | cumulative | module"
+    package_import_times = defaultdict(int)
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_time, _, name = line[len("import time:") :].split("|")
+        package_import_times[name.strip().split(".")[0]] += int(self_time)
+
+    return float(import_time), int(max_rss), package_import_times
+
+
+@cli.command(
+    help="Measure the cold import time and peak RSS of a module, like a "
+    "freshly started API worker"
+)
+def main(module: str = "app.main", runs: int = 5, top: int = 15):
+    import_times, max_rss_values = [], []
+    for _ in range(runs):
+        import_time, max_rss, package_import_times = measure(module)
+        import_times.append(import_time)
+        max_rss_values.append(max_rss)
+
+    print(
+        f"import {module}: median {statistics.median(import_times):.3f} s, "
+        f"min {min(import_times):.3f} s over {runs} runs"
+    )
+    print(f"peak RSS: {statistics.median(max_rss_values) / 1024:.1f} MiB")
+    print("slowest packages to import in the last run:")
+    for name, self_time in sorted(
+        package_import_times.items(), key=lambda item: -item[1]
+    )[:top]:
+        print(f"  {self_time / 1000:9.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    cli()
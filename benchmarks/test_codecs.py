@@ -0,0 +1,95 @@
+import time
+from pathlib import Path
+
+import eth_abi
+import pytest
+from eth_abi.decoding import ContextFramesBytesIO
+from web3 import Web3
+
+import app.constants as constants
+import utils.validation
+import utils.web3
+from utils.user_op import DEFAULTS_FOR_USER_OP, UserOp
+
+ENTRY_POINT = Web3.toChecksumAddress("0x" + "ee" * 20)
+VALIDATION_RESULT_TYPES = [
+    "(uint256,uint256,bool,uint48,uint48,bytes)",
+    "(uint256,uint256)",
+    "(uint256,uint256)",
+    "(uint256,uint256)",
+]
+AGGREGATOR = Web3.toChecksumAddress("0x" + "cc" * 20)
+
+
+@pytest.fixture
+def user_op() -> UserOp:
+    user_op = UserOp(**DEFAULTS_FOR_USER_OP)
+    user_op.init_code = b"\xaa" * 20 + b"\x01" * 68
+    user_op.paymaster_and_data = b"\xbb" * 20
+    user_op.signature = b"\x02" * 65
+    return user_op
+
+
+@pytest.fixture
+def validation_result_values() -> list:
+    now = int(time.time())
+    return [
+        (100_000, 10**15, False, now, now + 3600, b"\x01" * 64),
+        (0, 0),
+        (0, 0),
+        (0, 0),
+    ]
+
+
+@pytest.fixture
+def validation_result(validation_result_values) -> bytes:
+    return eth_abi.encode(VALIDATION_RESULT_TYPES, validation_result_values)
+
+
+@pytest.fixture
+def validation_result_with_aggregation(validation_result_values) -> bytes:
+    return eth_abi.encode(
+        VALIDATION_RESULT_TYPES + ["(address,(uint256,uint256))"],
+        validation_result_values + [(AGGREGATOR, (0, 0))],
+    )
+
+
+def test_encode_simulate_validation_precompiled(benchmark, user_op):
+    benchmark(utils.web3.encode_simulate_validation, user_op)
+
+
+@pytest.mark.skipif(
+    not (Path("build") / "contracts" / "EntryPoint.json").exists(),
+    reason="Needs the EntryPoint ABI, run `brownie compile` first",
+)
+def test_encode_simulate_validation_with_contract(benchmark, user_op):
+    entry_point = utils.web3.EntryPoint(ENTRY_POINT)
+    call_data = benchmark(
+        entry_point.encodeABI, "simulateValidation", [user_op.values()]
+    )
+    assert call_data == utils.web3.encode_simulate_validation(user_op)
+
+
+def test_decode_validation_result_precompiled(benchmark, validation_result):
+    decoder = utils.validation.VALIDATION_RESULT_DECODERS[
+        constants.VALIDATION_RESULT_SIGNATURE
+    ]
+    benchmark(lambda: decoder(ContextFramesBytesIO(validation_result)))
+
+
+def test_decode_validation_result_with_aggregation_precompiled(
+    benchmark, validation_result_with_aggregation
+):
+    decoder = utils.validation.VALIDATION_RESULT_DECODERS[
+        constants.VALIDATION_RESULT_WITH_AGGREGATION_SIGNATURE
+    ]
+    result = benchmark(
+        lambda: decoder(
+            ContextFramesBytesIO(validation_result_with_aggregation)
+        )
+    )
+    assert Web3.toChecksumAddress(result[-1][0]) == AGGREGATOR
+
+
+def test_decode_validation_result_with_eth_abi(benchmark, validation_result):
+    benchmark(eth_abi.decode, VALIDATION_RESULT_TYPES, validation_result)
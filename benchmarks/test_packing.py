@@ -0,0 +1,104 @@
+import random
+from dataclasses import dataclass, field
+
+import pytest
+
+import utils.packing
+
+BASE_FEE = 10
+GAS_LIMIT = 15_000_000
+
+
+@dataclass
+class Bytecode:
+    hash: str
+    is_trusted: bool
+
+
+@dataclass
+class Candidate:
+    sender: str
+    call_gas_limit: int
+    verification_gas_limit: int
+    pre_verification_gas: int
+    max_fee_per_gas: int
+    max_priority_fee_per_gas: int
+    bytecodes: list[Bytecode] = field(default_factory=list)
+
+    def get_required_gas(self) -> int:
+        return (
+            self.call_gas_limit
+            + self.verification_gas_limit
+            + self.pre_verification_gas
+        )
+
+
+def generate_candidates(count: int, seed: int = 0) -> list[Candidate]:
+    rng = random.Random(seed)
+    trusted_bytecodes = [Bytecode(f"0xtrusted{i}", True) for i in range(5)]
+    candidates = []
+    for i in range(count):
+        max_priority_fee_per_gas = rng.randint(1, 100)
+        bytecodes = [rng.choice(trusted_bytecodes)]
+        if rng.random() < 0.3:
+            bytecodes.append(
+                Bytecode(f"0xuntrusted{rng.randrange(count // 10)}", None)
+            )
+        candidates.append(
+            Candidate(
+                sender=f"0xsender{rng.randrange(count // 2)}",
+                call_gas_limit=rng.randint(9300, 500_000),
+                verification_gas_limit=rng.randint(50_000, 200_000),
+                pre_verification_gas=rng.randint(20_000, 60_000),
+                max_fee_per_gas=BASE_FEE
+                + max_priority_fee_per_gas
+                + rng.randint(0, 20),
+                max_priority_fee_per_gas=max_priority_fee_per_gas,
+                bytecodes=bytecodes,
+            )
+        )
+
+    return candidates
+
+
+def validate_bundle(user_ops: list[Candidate]):
+    senders = [user_op.sender for user_op in user_ops]
+    assert len(senders) == len(set(senders))
+
+    untrusted_bytecode_hashes = [
+        bytecode_hash
+        for user_op in user_ops
+        for bytecode_hash in utils.packing.get_untrusted_bytecode_hashes(
+            user_op
+        )
+    ]
+    assert len(untrusted_bytecode_hashes) == len(set(untrusted_bytecode_hashes))
+    assert sum(user_op.get_required_gas() for user_op in user_ops) <= GAS_LIMIT
+
+
+def select_fifo(user_ops: list, gas_limit: int) -> list:
+    return utils.packing.fill_bundle(
+        [(user_op.get_required_gas(), user_op) for user_op in user_ops],
+        gas_limit,
+    )
+
+
+@pytest.mark.parametrize("count", (1_000, 10_000))
+def test_pack_user_ops(benchmark, count):
+    candidates = generate_candidates(count)
+
+    packed_user_ops = benchmark(
+        utils.packing.pack_user_ops, candidates, GAS_LIMIT, BASE_FEE
+    )
+    validate_bundle(packed_user_ops)
+
+    fifo_user_ops = select_fifo(candidates, GAS_LIMIT)
+    validate_bundle(fifo_user_ops)
+    packed_revenue = utils.packing.get_revenue(packed_user_ops, BASE_FEE)
+    fifo_revenue = utils.packing.get_revenue(fifo_user_ops, BASE_FEE)
+    benchmark.extra_info.update(
+        packed_revenue=packed_revenue,
+        fifo_revenue=fifo_revenue,
+        revenue_gain=packed_revenue / fifo_revenue,
+    )
+    assert packed_revenue >= fifo_revenue
@@ -0,0 +1,105 @@
+import time
+import tracemalloc
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import eth_abi
+import pytest
+from web3 import Web3
+
+import app.constants as constants
+import utils.validation
+import utils.web3
+from utils.trace import CompactTrace
+from benchmarks.trace_generator import ENTRY_POINT, generate_trace
+
+entry_point = SimpleNamespace(address=Web3.toChecksumAddress(ENTRY_POINT))
+
+
+@pytest.fixture(autouse=True)
+def is_contract():
+    with patch.object(utils.web3, "is_contract", return_value=True):
+        yield
+
+
+def check_trace(struct_logs: list[dict]) -> (int, str):
+    return utils.validation.validate_called_instructions(
+        CompactTrace(struct_logs), entry_point, initializing=True
+    )
+
+
+def get_peak_memory(f, *args, **kwargs) -> int:
+    tracemalloc.start()
+    try:
+        f(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize("length", (1_000, 10_000, 50_000))
+@pytest.mark.parametrize("calls", (0, 100))
+@pytest.mark.parametrize("memory_words", (4, 32))
+def test_validate_called_instructions(benchmark, length, calls, memory_words):
+    trace = generate_trace(
+        length, depth=3, calls=calls, memory_words=memory_words
+    )
+
+    result = benchmark(check_trace, trace)
+    assert result == (None, None)
+    benchmark.extra_info["peak_memory"] = get_peak_memory(check_trace, trace)
+
+
+@pytest.mark.parametrize("memory_words", (32, 4096))
+def test_validate_entry_point_calls(benchmark, memory_words):
+    trace = generate_trace(200, calls=50, memory_words=memory_words)
+
+    result = benchmark(check_trace, trace)
+    assert result == (None, None)
+
+
+@pytest.mark.parametrize("position", ("start", "end"))
+def test_validate_called_instructions_with_prohibited_opcode(
+    benchmark, position
+):
+    length = 10_000
+    trace = generate_trace(
+        length,
+        calls=100,
+        prohibited_opcode_position=1 if position == "start" else length - 1,
+    )
+
+    _, error_msg = benchmark(check_trace, trace)
+    assert "prohibited opcode 'TIMESTAMP'" in error_msg
+
+
+@pytest.mark.parametrize("aggregated", (False, True))
+def test_simulation_result(benchmark, aggregated):
+    now = int(time.time())
+    types = [
+        "(uint256,uint256,bool,uint48,uint48,bytes)",
+        "(uint256,uint256)",
+        "(uint256,uint256)",
+        "(uint256,uint256)",
+    ]
+    values = [
+        (100_000, 10**15, False, now, now + 3600, b"\x01" * 64),
+        (0, 0),
+        (0, 0),
+        (0, 0),
+    ]
+    signature = constants.VALIDATION_RESULT_SIGNATURE
+    if aggregated:
+        types.append("(address,(uint256,uint256))")
+        values.append((ENTRY_POINT, (0, 0)))
+        signature = constants.VALIDATION_RESULT_WITH_AGGREGATION_SIGNATURE
+    err_msg = "0x" + signature + eth_abi.encode(types, values).hex()
+    trace = generate_trace(10_000)
+
+    simulation_result = benchmark(
+        utils.validation.SimulationResult, err_msg, trace
+    )
+    assert simulation_result.pre_op_gas == 100_000
+    benchmark.extra_info["peak_memory"] = get_peak_memory(
+        utils.validation.SimulationResult, err_msg, trace
+    )
@@ -0,0 +1,115 @@
+import json
+import random
+from typing import Optional
+
+import app.constants as constants
+
+ENTRY_POINT = "0x" + "ee" * 20
+HELPER_CONTRACT = "0x" + "aa" * 20
+SAFE_OPCODES = (
+    "PUSH1",
+    "PUSH2",
+    "POP",
+    "DUP1",
+    "DUP2",
+    "SWAP1",
+    "ADD",
+    "SUB",
+    "MUL",
+    "AND",
+    "ISZERO",
+    "JUMP",
+    "JUMPI",
+    "JUMPDEST",
+    "MLOAD",
+    "MSTORE",
+    "SLOAD",
+    "CALLDATALOAD",
+    "CALLER",
+    "KECCAK256",
+)
+CALL_OPCODES = ("CALL", "STATICCALL", "DELEGATECALL")
+
+
+def generate_trace(
+    length: int,
+    depth: int = 2,
+    calls: int = 0,
+    memory_words: int = 8,
+    prohibited_opcode_position: Optional[int] = None,
+    helper_contracts: int = 2,
+    seed: int = 0,
+) -> list[dict]:
+    rng = random.Random(seed)
+    memory = [rng.randbytes(32).hex() for _ in range(memory_words)]
+    memory[0] = constants.DEPOSIT_TO_SIGNATURE + memory[0][8:]
+
+    helper_contract_positions = {
+        length * i // helper_contracts for i in range(helper_contracts)
+    }
+    reserved_positions = helper_contract_positions | {
+        prohibited_opcode_position
+    }
+    gas_positions = set(
+        rng.sample(
+            [
+                i
+                for i in range(1, length - 1, 2)
+                if i not in reserved_positions
+                and i + 1 not in reserved_positions
+            ],
+            calls,
+        )
+    )
+
+    trace = []
+    for i in range(length):
+        if i in helper_contract_positions:
+            trace.append(generate_step("NUMBER", 1, memory))
+            continue
+
+        step_depth = 2 + i * (depth - 1) // length
+        if i == prohibited_opcode_position:
+            trace.append(generate_step("TIMESTAMP", step_depth, memory))
+        elif i in gas_positions:
+            trace.append(generate_step("GAS", step_depth, memory))
+        elif i - 1 in gas_positions:
+            trace.append(
+                generate_call_step(
+                    rng.choice(CALL_OPCODES),
+                    step_depth,
+                    memory,
+                    rng.choice((ENTRY_POINT, HELPER_CONTRACT)),
+                )
+            )
+        else:
+            trace.append(
+                generate_step(rng.choice(SAFE_OPCODES), step_depth, memory)
+            )
+
+    # Decoding the JSON gives every step its own objects, like a trace
+    # received from the node
+    return json.loads(json.dumps(trace))
+
+
+def generate_step(opcode: str, depth: int, memory: list[str]) -> dict:
+    return {
+        "op": opcode,
+        "depth": depth,
+        "stack": [to_word(depth), to_word(0)],
+        "memory": memory,
+    }
+
+
+def generate_call_step(
+    opcode: str, depth: int, memory: list[str], target: str
+) -> dict:
+    stack = [to_word(0)] * 2 + [to_word(0), to_word(int(target, 16))]
+    stack.append(to_word(0x1000))  # gas
+    if opcode == "CALL":
+        stack.insert(3, to_word(0))  # value
+    return {"op": opcode, "depth": depth, "stack": stack, "memory": memory}
+
+
+def to_word(value: int) -> str:
+    return value.to_bytes(32, byteorder="big").hex()
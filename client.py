@@ -1,8 +1,10 @@
 import asyncio
 
 import typer
+from eth_account import Account
 from httpx import AsyncClient
 
+import utils.bench
 from utils.client import AppClient, SendRequest, get_rpc_uri
 from utils.user_op import UserOp
 
@@ -283,5 +285,57 @@ async def _last_user_ops(host):
         return await AppClient(client).last_user_ops()
 
 
+@cli.command(
+    help="Send many signed UserOps creating SimpleAccounts and report the "
+    "throughput and latency percentiles per method"
+)
+def bench(
+    host: str = typer.Argument(..., help="Mempool RPC URL"),
+    node: str = typer.Argument(..., help="Ethereum node RPC URL"),
+    entry_point: str = typer.Argument(..., help="The entry point address"),
+    factory: str = typer.Argument(..., help="SimpleAccountFactory address"),
+    paymaster: str = typer.Argument(
+        ..., help="Address of a paymaster sponsoring the UserOps"
+    ),
+    count: int = typer.Option(100, help="Number of UserOps to send"),
+    concurrency: int = typer.Option(10, help="Maximum in-flight requests"),
+    rate: float = typer.Option(
+        0, help="Target requests per second (0 for as fast as possible)"
+    ),
+    estimate: bool = typer.Option(
+        False,
+        help="Estimate each UserOp and wait for the estimate before "
+        "sending it",
+    ),
+    private_key: str = typer.Option(
+        "", help="Private key of the account owner (random if empty)"
+    ),
+    first_salt: int = typer.Option(0, help="Salt of the first account"),
+):
+    owner = Account.from_key(private_key) if private_key else Account.create()
+    send_requests = utils.bench.build_send_requests(
+        node, entry_point, factory, paymaster, owner, count, first_salt
+    )
+    methods = ["eth_sendUserOperation"]
+    if estimate:
+        methods.insert(0, "eth_estimateUserOperationGas")
+
+    results = asyncio.run(
+        utils.bench.run(
+            get_rpc_uri(host), methods, send_requests, concurrency, rate
+        )
+    )
+    for method, result in results.items():
+        print(
+            f"{method}: {result['requests']} requests, "
+            f"{result['errors']} errors, "
+            f"{result['throughput']:.1f} req/s, "
+            + ", ".join(
+                f"p{percentile} {result[f'p{percentile}'] * 1000:.1f} ms"
+                for percentile in utils.bench.PERCENTILES
+            )
+        )
+
+
 if __name__ == "__main__":
     cli()
@@ -1,7 +1,9 @@
+from sqlalchemy import ARRAY
 from sqlalchemy import Boolean
 from sqlalchemy import Column
 from sqlalchemy import DateTime
 from sqlalchemy import ForeignKey
+from sqlalchemy import Index
 from sqlalchemy import Integer
 from sqlalchemy import LargeBinary
 from sqlalchemy import String
@@ -56,6 +58,9 @@ class UserOp(Base):
     paymaster_and_data = Column(LargeBinary)
     entry_point = Column(String(length=42))
     signature = Column(LargeBinary)
+    aggregator = Column(String(length=42))
+    factory = Column(String(length=42), index=True)
+    paymaster = Column(String(length=42), index=True)
     pre_op_gas = Column(Uint256)
     valid_after = Column(DateTime, index=True)
     valid_until = Column(DateTime)
@@ -70,6 +75,27 @@ class UserOp(Base):
         lazy="noload",
     )
 
+    __table_args__ = (
+        Index(
+            "ix_user_ops_pending_fee",
+            max_priority_fee_per_gas,
+            postgresql_where=tx_hash.is_(None),
+        ),
+        Index(
+            "ix_user_ops_pending_entry_point_fee",
+            entry_point,
+            max_priority_fee_per_gas,
+            postgresql_where=tx_hash.is_(None),
+        ),
+        Index(
+            "ix_user_ops_pending_sender_nonce",
+            sender,
+            nonce,
+            unique=True,
+            postgresql_where=tx_hash.is_(None),
+        ),
+    )
+
     def serialize(self):
         obj_dict = super().__dict__.copy()
         for key, value in obj_dict.items():
@@ -81,6 +107,28 @@ class UserOp(Base):
                 obj_dict[key] = hex(value)
         return obj_dict
 
+    def values(self) -> list:
+        return [
+            self.sender,
+            self.nonce,
+            self.init_code,
+            self.call_data,
+            self.call_gas_limit,
+            self.verification_gas_limit,
+            self.pre_verification_gas,
+            self.max_fee_per_gas,
+            self.max_priority_fee_per_gas,
+            self.paymaster_and_data,
+            self.signature,
+        ]
+
+    def get_required_gas(self) -> int:
+        return (
+            self.call_gas_limit
+            + self.verification_gas_limit
+            + self.pre_verification_gas
+        )
+
 
 class Bytecode(Base):
     __tablename__ = "bytecodes"
@@ -88,6 +136,7 @@ class Bytecode(Base):
     id = Column(Integer, primary_key=True)
     hash = Column(String(length=66), unique=True, index=True)
     is_trusted = Column(Boolean)
+    restricted_opcodes = Column(ARRAY(String))
     user_ops = Relationship(
         "UserOp",
         secondary=user_ops_bytecodes,
@@ -101,3 +150,21 @@ class EntryPoint(Base):
 
     id = Column(Integer, primary_key=True)
     address = Column(String(length=42), unique=True)
+
+
+class Reputation(Base):
+    __tablename__ = "reputations"
+
+    id = Column(Integer, primary_key=True)
+    entity = Column(String(length=66), unique=True, index=True)
+    ops_seen = Column(Integer, nullable=False, default=0)
+    ops_included = Column(Integer, nullable=False, default=0)
+    decayed_at = Column(DateTime, index=True, nullable=False)
+
+
+class Checkpoint(Base):
+    __tablename__ = "checkpoints"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(length=32), unique=True, nullable=False)
+    block_number = Column(Integer, nullable=False)
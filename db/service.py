@@ -1,24 +1,58 @@
 import datetime
 
-from sqlalchemy import select, delete, func
+from typing import Optional
+
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
+import utils.reputation
 import utils.web3
-from db.models import Bytecode, UserOp, EntryPoint
-
-
-async def add_user_op(session: AsyncSession, user_op, **extra_data):
-    user_op = dict(user_op)
-    user_op.update(extra_data)
-    user_op = UserOp(**user_op)
-    session.add(user_op)
-
-    return user_op
+from db.models import (
+    Bytecode,
+    Checkpoint,
+    EntryPoint,
+    Reputation,
+    UserOp,
+    user_ops_bytecodes,
+)
+
+
+async def upsert_user_op(
+    session: AsyncSession, user_op, fee_bump: int, **extra_data
+) -> Optional[int]:
+    max_fee_per_gas, max_priority_fee_per_gas = user_op.get_replaceable_fees(
+        fee_bump
+    )
+    values = dict(user_op)
+    values.update(extra_data)
+
+    statement = postgresql.insert(UserOp).values(**values)
+    statement = statement.on_conflict_do_update(
+        index_elements=[UserOp.sender, UserOp.nonce],
+        index_where=UserOp.tx_hash.is_(None),
+        set_={key: statement.excluded[key] for key in values},
+        where=or_(
+            UserOp.expires_at <= datetime.datetime.now(),
+            and_(
+                UserOp.max_fee_per_gas <= max_fee_per_gas,
+                UserOp.max_priority_fee_per_gas <= max_priority_fee_per_gas,
+            ),
+        ),
+    )
+    result = await session.execute(statement.returning(UserOp.id))
+    return result.scalar()
 
 
 async def add_user_op_bytecodes(
-    session: AsyncSession, user_op: UserOp, bytecode_hashes: list[str]
+    session: AsyncSession, user_op_id: int, bytecode_hashes: list[str]
 ):
+    await session.execute(
+        delete(user_ops_bytecodes).where(
+            user_ops_bytecodes.c.user_op_id == user_op_id
+        )
+    )
     for bytecode_hash in bytecode_hashes:
         bytecode = (
             await session.execute(
@@ -31,14 +65,111 @@ async def add_user_op_bytecodes(
             session.add(bytecode)
             await session.flush()
 
-        user_op.bytecodes.append(bytecode)
+        await session.execute(
+            insert(user_ops_bytecodes).values(
+                user_op_id=user_op_id, bytecode_id=bytecode.id
+            )
+        )
+
+
+async def delete_user_op(session: AsyncSession, user_op: UserOp):
+    await session.execute(delete(UserOp).where(UserOp.id == user_op.id))
+
+
+async def delete_expired_user_ops(session: AsyncSession):
+    await session.execute(
+        delete(UserOp)
+        .where(UserOp.expires_at <= datetime.datetime.now())
+        .where(UserOp.tx_hash.is_(None))
+    )
+
+
+async def count_user_ops(
+    session: AsyncSession,
+    limit: int,
+    entry_point_address: str = None,
+    sender: str = None,
+) -> int:
+    query = where_user_op_valid(select(UserOp.id))
+    if entry_point_address is not None:
+        query = query.where(UserOp.entry_point == entry_point_address)
+    if sender is not None:
+        query = query.where(UserOp.sender == sender)
+
+    result = await session.execute(
+        select(func.count()).select_from(query.limit(limit).subquery())
+    )
+    return result.scalar()
+
+
+async def count_user_ops_by_trust(session: AsyncSession) -> dict[bool, int]:
+    result = await session.execute(
+        where_user_op_valid(
+            select(UserOp.is_trusted, func.count()).group_by(UserOp.is_trusted)
+        )
+    )
+    return dict(result.all())
 
 
-async def delete_user_op_by_sender(
-    session: AsyncSession, sender: str
+async def get_user_op_with_lowest_fee(
+    session: AsyncSession, entry_point_address: str = None
 ) -> UserOp:
+    query = where_user_op_valid(select(UserOp))
+    if entry_point_address is not None:
+        query = query.where(UserOp.entry_point == entry_point_address)
+
+    query = query.order_by(UserOp.max_priority_fee_per_gas, UserOp.id.desc())
+    result = await session.execute(query.limit(1))
+    return result.scalar()
+
+
+async def delete_user_ops(session: AsyncSession, user_op_ids: list[int]):
+    await session.execute(delete(UserOp).where(UserOp.id.in_(user_op_ids)))
+
+
+async def get_user_ops_to_revalidate(
+    session: AsyncSession,
+    addresses: set[str],
+    valid_after_from: datetime.datetime,
+    valid_after_to: datetime.datetime,
+) -> list[UserOp]:
+    result = await session.execute(
+        where_user_op_valid(select(UserOp)).where(
+            or_(
+                UserOp.sender.in_(addresses),
+                UserOp.factory.in_(addresses),
+                UserOp.paymaster.in_(addresses),
+                and_(
+                    UserOp.valid_after > valid_after_from,
+                    UserOp.valid_after <= valid_after_to,
+                ),
+            )
+        )
+    )
+    return result.scalars().all()
+
+
+async def try_advisory_lock(session: AsyncSession, key: int) -> bool:
+    result = await session.execute(select(func.pg_try_advisory_xact_lock(key)))
+    return result.scalar()
+
+
+async def get_checkpoint(session: AsyncSession, name: str) -> Optional[int]:
+    result = await session.execute(
+        select(Checkpoint.block_number).where(Checkpoint.name == name)
+    )
+    return result.scalar()
+
+
+async def set_checkpoint(session: AsyncSession, name: str, block_number: int):
+    statement = postgresql.insert(Checkpoint).values(
+        name=name, block_number=block_number
+    )
     await session.execute(
-        where_user_op_valid(delete(UserOp).where(UserOp.sender == sender))
+        statement.on_conflict_do_update(
+            index_elements=[Checkpoint.name],
+            set_={"block_number": statement.excluded.block_number},
+        )
     )
 
 
@@ -59,6 +190,21 @@ async def get_last_user_ops(session: AsyncSession, count: int) -> list[UserOp]:
     return last_user_ops
 
 
+async def get_user_ops_for_bundle(
+    session: AsyncSession, entry_point_address: str
+) -> list[UserOp]:
+    now = datetime.datetime.now()
+    result = await session.execute(
+        where_user_op_valid(select(UserOp))
+        .where(func.lower(UserOp.entry_point) == entry_point_address.lower())
+        .where(UserOp.valid_after <= now)
+        .where(UserOp.valid_until > now)
+        .options(selectinload(UserOp.bytecodes))
+        .order_by(UserOp.id)
+    )
+    return result.scalars().all()
+
+
 def where_user_op_valid(expression):
     now = datetime.datetime.now()
     return expression.where(UserOp.expires_at > now).where(
@@ -71,20 +217,59 @@ async def get_user_op_by_hash(session: AsyncSession, hash_: str) -> UserOp:
     return result.scalar()
 
 
+async def get_user_op_by_sender_and_nonce(
+    session: AsyncSession, sender: str, nonce: int
+) -> UserOp:
+    result = await session.execute(
+        where_user_op_valid(select(UserOp))
+        .where(UserOp.sender == sender)
+        .where(UserOp.nonce == nonce)
+    )
+    return result.scalar()
+
+
 async def get_user_op_receipt(user_op: UserOp) -> (str, bool):
     await refresh_user_op_receipt(user_op)
     return user_op.tx_hash, user_op.accepted
 
 
-async def all_trusted_bytecodes(
+async def get_trusted_bytecode_hashes(
     session: AsyncSession, bytecode_hashes: list[str]
-) -> bool:
+) -> set[str]:
     result = await session.execute(
-        select(Bytecode)
+        select(Bytecode.hash)
         .where(Bytecode.hash.in_(bytecode_hashes))
         .where(Bytecode.is_trusted == True)
     )
-    return bool(len(result.all()) == len(bytecode_hashes))
+    return set(result.scalars().all())
+
+
+async def get_restricted_opcodes(
+    session: AsyncSession, bytecode_hashes: list[str]
+) -> dict[str, list[str]]:
+    result = await session.execute(
+        select(Bytecode.hash, Bytecode.restricted_opcodes)
+        .where(Bytecode.hash.in_(bytecode_hashes))
+        .where(Bytecode.restricted_opcodes.is_not(None))
+    )
+    return dict(result.all())
+
+
+async def set_restricted_opcodes(
+    session: AsyncSession, restricted_opcodes: dict[str, list[str]]
+):
+    statement = postgresql.insert(Bytecode).values(
+        [
+            {"hash": hash_, "restricted_opcodes": opcodes}
+            for hash_, opcodes in restricted_opcodes.items()
+        ]
+    )
+    await session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[Bytecode.hash],
+            set_={"restricted_opcodes": statement.excluded.restricted_opcodes},
+        )
+    )
 
 
 async def any_prohibited_bytecodes(
@@ -113,6 +298,18 @@ async def any_user_op_with_another_sender_using_bytecodes(
     return result.fetchone() is not None
 
 
+async def count_user_ops_using_bytecode(
+    session: AsyncSession, bytecode_hash: str, limit: int
+) -> int:
+    query = where_user_op_valid(select(UserOp.id)).where(
+        UserOp.bytecodes.any(Bytecode.hash == bytecode_hash)
+    )
+    result = await session.execute(
+        select(func.count()).select_from(query.limit(limit).subquery())
+    )
+    return result.scalar()
+
+
 async def update_bytecode(session: AsyncSession, hash_: str, is_trusted: bool):
     bytecode = (
         await session.execute(select(Bytecode).where(Bytecode.hash == hash_))
@@ -147,13 +344,59 @@ async def refresh_user_op_receipt(user_op: UserOp) -> bool:
         user_op.hash, user_op.entry_point
     )
     if tx_hash:
-        user_op.accepted = accepted
         user_op.tx_hash = tx_hash.hex()
+        user_op.accepted = accepted
         return True
 
     return False
 
 
+async def set_user_op_receipts(
+    session: AsyncSession, receipts: dict[str, tuple[str, str, bool]]
+) -> list[UserOp]:
+    if not receipts:
+        return []
+
+    # A receipt may already have been stored by a client reading it, the
+    # inclusion is still credited here, once per block
+    result = await session.execute(
+        select(UserOp).where(UserOp.hash.in_(receipts))
+    )
+    user_ops = []
+    for user_op in result.scalars():
+        entry_point, tx_hash, accepted = receipts[user_op.hash]
+        # Any contract can emit the event, only the entry point is trusted
+        if user_op.entry_point.lower() != entry_point.lower():
+            continue
+        if user_op.tx_hash is None:
+            user_op.tx_hash = tx_hash
+            user_op.accepted = accepted
+        # The bytecodes are credited from the rows stored on admission, so
+        # the inclusion counts whichever worker admitted the UserOp
+        utils.reputation.tracker.included(
+            utils.reputation.get_user_op_entities(user_op)
+            + await get_untrusted_bytecode_hashes(session, user_op.id)
+        )
+        user_ops.append(user_op)
+
+    return user_ops
+
+
+async def get_untrusted_bytecode_hashes(
+    session: AsyncSession, user_op_id: int
+) -> list[str]:
+    result = await session.execute(
+        select(Bytecode.hash)
+        .join(
+            user_ops_bytecodes,
+            user_ops_bytecodes.c.bytecode_id == Bytecode.id,
+        )
+        .where(user_ops_bytecodes.c.user_op_id == user_op_id)
+        .where(Bytecode.is_trusted.is_not(True))
+    )
+    return result.scalars().all()
+
+
 async def get_supported_entry_points(session: AsyncSession) -> list[EntryPoint]:
     result = await session.execute(select(EntryPoint))
     return result.scalars().all()
@@ -185,3 +428,66 @@ async def update_entry_point(
                 func.lower(EntryPoint.address) == entry_point_address.lower()
             )
         )
+
+
+async def add_reputation_deltas(
+    session: AsyncSession, deltas: dict[str, list[int]]
+):
+    if not deltas:
+        return
+
+    statement = postgresql.insert(Reputation).values(
+        [
+            {
+                "entity": entity,
+                "ops_seen": ops_seen,
+                "ops_included": ops_included,
+                "decayed_at": datetime.datetime.now(),
+            }
+            for entity, (ops_seen, ops_included) in deltas.items()
+        ]
+    )
+    await session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[Reputation.entity],
+            set_={
+                "ops_seen": Reputation.ops_seen + statement.excluded.ops_seen,
+                "ops_included": Reputation.ops_included
+                + statement.excluded.ops_included,
+            },
+        )
+    )
+
+
+async def decay_reputations(
+    session: AsyncSession, decay_interval: datetime.timedelta
+):
+    now = datetime.datetime.now()
+    await session.execute(
+        update(Reputation)
+        .where(Reputation.decayed_at <= now - decay_interval)
+        .values(
+            ops_seen=Reputation.ops_seen * 23 // 24,
+            ops_included=Reputation.ops_included * 23 // 24,
+            decayed_at=now,
+        )
+    )
+    await session.execute(
+        delete(Reputation)
+        .where(Reputation.ops_seen == 0)
+        .where(Reputation.ops_included == 0)
+    )
+
+
+async def get_reputations(
+    session: AsyncSession, min_ops_seen: int
+) -> dict[str, list[int]]:
+    result = await session.execute(
+        select(
+            Reputation.entity, Reputation.ops_seen, Reputation.ops_included
+        ).where(Reputation.ops_seen >= min_ops_seen)
+    )
+    return {
+        entity: [ops_seen, ops_included]
+        for entity, ops_seen, ops_included in result.all()
+    }
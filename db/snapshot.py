@@ -0,0 +1,126 @@
+import datetime
+import gzip
+import struct
+
+from sqlalchemy import delete, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import Bytecode, EntryPoint, UserOp, user_ops_bytecodes
+
+MAGIC = b"4337POOL\x02"
+LENGTH = struct.Struct(">I")
+
+PENDING = "tx_hash IS NULL AND expires_at > $1"
+TABLES = (
+    (EntryPoint.__table__, None),
+    (Bytecode.__table__, None),
+    (UserOp.__table__, PENDING),
+    (
+        user_ops_bytecodes,
+        f"user_op_id IN (SELECT id FROM user_ops WHERE {PENDING})",
+    ),
+)
+
+
+async def export_pool(session: AsyncSession, path: str) -> dict[str, int]:
+    # All the tables are read from one snapshot of the database, so the
+    # associations always point to exported UserOps
+    await session.connection(
+        execution_options={
+            "isolation_level": "REPEATABLE READ",
+            "postgresql_readonly": True,
+        }
+    )
+    connection = await get_driver_connection(session)
+    now = datetime.datetime.now()
+    row_counts = {}
+    with gzip.open(path, "wb") as f:
+        f.write(MAGIC)
+        for table, where in TABLES:
+            columns = table.columns.keys()
+            query = f"SELECT {', '.join(columns)} FROM {table.name}"
+            args = ()
+            if where is not None:
+                query += f" WHERE {where}"
+                args = (now,)
+
+            write_chunk(f, table.name.encode())
+            write_chunk(f, ",".join(columns).encode())
+
+            async def write_data(data: bytes):
+                if data:
+                    write_chunk(f, data)
+
+            status = await connection.copy_from_query(
+                query, *args, output=write_data, format="binary"
+            )
+            write_chunk(f, b"")
+            row_counts[table.name] = int(status.split()[-1])
+
+    return row_counts
+
+
+async def import_pool(session: AsyncSession, path: str) -> dict[str, int]:
+    tables = {table.name: table for table, _ in TABLES}
+    connection = await get_driver_connection(session)
+    for table, _ in reversed(TABLES):
+        await session.execute(delete(table))
+
+    row_counts = {}
+    with gzip.open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a mempool snapshot")
+
+        while name := read_chunk(f):
+            name = name.decode()
+            columns = read_chunk(f).decode().split(",")
+            if name not in tables:
+                raise ValueError(f"{path} contains an unknown table `{name}`")
+            if columns != tables[name].columns.keys():
+                raise ValueError(
+                    f"The columns of `{name}` in {path} do not match the "
+                    f"database schema: {', '.join(columns)}"
+                )
+
+            status = await connection.copy_to_table(
+                name,
+                source=read_data(f),
+                columns=columns,
+                format="binary",
+            )
+            row_counts[name] = int(status.split()[-1])
+
+    for table, _ in TABLES:
+        if "id" in table.columns:
+            await session.execute(
+                text(
+                    f"SELECT setval(pg_get_serial_sequence('{table.name}', "
+                    f"'id'), coalesce(max(id), 0) + 1, false) FROM {table.name}"
+                )
+            )
+
+    return row_counts
+
+
+async def get_driver_connection(session: AsyncSession):
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    return raw_connection.driver_connection
+
+
+def write_chunk(f, data: bytes):
+    f.write(LENGTH.pack(len(data)))
+    f.write(data)
+
+
+def read_chunk(f) -> bytes:
+    header = f.read(LENGTH.size)
+    if not header:
+        return b""
+    return f.read(LENGTH.unpack(header)[0])
+
+
+async def read_data(f):
+    # The COPY data of a table is a run of chunks ended by an empty one
+    while data := read_chunk(f):
+        yield data
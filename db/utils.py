@@ -1,6 +1,7 @@
 import asyncpg
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 
+import utils.metrics
 from app.config import settings
 from db.base import Base, async_session
 
@@ -31,4 +32,5 @@ async def create_and_init(db_name):
 async def get_session() -> AsyncSession:
     async with async_session() as session:
         yield session
-        await session.commit()
+        with utils.metrics.measure("commit"):
+            await session.commit()
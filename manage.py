@@ -1,10 +1,15 @@
 import asyncio
+import os
+import shutil
+import tempfile
 
 import typer
 import uvicorn
 
 import db.service
+import db.snapshot
 import db.utils
+import utils.bundler
 from app.config import settings
 from db.base import async_session
 
@@ -20,6 +25,14 @@ def initialize_db():
 
 @cli.command(help="Run the app server")
 def runserver(workers: int = 8):
+    # Workers write their metrics to files in this directory so that any of
+    # them can serve /metrics for the whole server
+    metrics_dir = os.environ.setdefault(
+        "PROMETHEUS_MULTIPROC_DIR",
+        os.path.join(tempfile.gettempdir(), "mempool-metrics"),
+    )
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
     uvicorn.run("app.main:app", host="0.0.0.0", port=8545, workers=workers)
 
 
@@ -54,5 +67,60 @@ async def _update_entry_point(address: str, is_supported: bool):
         await session.commit()
 
 
+@cli.command(
+    help="Build handleOps bundles from the pending UserOps and print their "
+    "calldata"
+)
+def build_bundles(beneficiary: str, gas_limit: int = settings.bundle_gas_limit):
+    asyncio.run(_build_bundles(beneficiary, gas_limit))
+
+
+async def _build_bundles(beneficiary: str, gas_limit: int):
+    async with async_session() as session:
+        bundles = await utils.bundler.build_bundles(
+            session, beneficiary, gas_limit=gas_limit
+        )
+
+    for bundle in bundles:
+        print(
+            f"EntryPoint {bundle.entry_point}: {len(bundle.user_ops)} UserOps, "
+            f"{bundle.get_required_gas()} gas"
+        )
+        print(bundle.call_data)
+
+
+@cli.command(
+    help="Export the pending UserOps, the bytecode trust list and the entry "
+    "points to a compressed snapshot file"
+)
+def export_pool(path: str):
+    asyncio.run(_export_pool(path))
+
+
+async def _export_pool(path: str):
+    async with async_session() as session:
+        row_counts = await db.snapshot.export_pool(session, path)
+
+    for table_name, row_count in row_counts.items():
+        print(f"Exported {row_count} rows from `{table_name}`")
+
+
+@cli.command(
+    help="Replace the pool, the bytecode trust list and the entry points with "
+    "the contents of a snapshot file"
+)
+def import_pool(path: str):
+    asyncio.run(_import_pool(path))
+
+
+async def _import_pool(path: str):
+    async with async_session() as session:
+        row_counts = await db.snapshot.import_pool(session, path)
+        await session.commit()
+
+    for table_name, row_count in row_counts.items():
+        print(f"Imported {row_count} rows into `{table_name}`")
+
+
 if __name__ == "__main__":
     cli()
@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import json
+import random
+from collections import defaultdict
+from pathlib import Path
+from typing import Optional
+
+import httpx
+import typer
+import uvicorn
+from fastapi import FastAPI, Request
+
+NO_RECORDED_RESPONSE = -32000
+
+cli = typer.Typer()
+
+
+class Recording:
+    def __init__(self, path: Path):
+        self.path = path
+        self.calls = {}
+        if path.exists():
+            with open(path) as f:
+                self.calls = json.load(f)
+        self._positions = defaultdict(int)
+
+    def get_response(self, method: str, params) -> Optional[dict]:
+        key = get_key(method, params)
+        if key not in self.calls:
+            return None
+
+        responses = self.calls[key]["responses"]
+        position = self._positions[key]
+        self._positions[key] = min(position + 1, len(responses) - 1)
+        return responses[position]
+
+    def add_response(self, method: str, params, response: dict):
+        key = get_key(method, params)
+        self.calls.setdefault(
+            key, {"method": method, "params": params, "responses": []}
+        )["responses"].append(
+            {k: v for k, v in response.items() if k in ("result", "error")}
+        )
+
+    def save(self):
+        with open(self.path, "w") as f:
+            json.dump(self.calls, f, indent=1, sort_keys=True)
+
+
+def get_key(method: str, params) -> str:
+    return (
+        method
+        + ":"
+        + hashlib.sha256(
+            json.dumps(params, sort_keys=True).encode()
+        ).hexdigest()
+    )
+
+
+def create_app(
+    fixtures: Path,
+    upstream: Optional[str] = None,
+    latency: float = 0,
+    jitter: float = 0,
+    method_latencies: Optional[dict[str, float]] = None,
+    seed: int = 0,
+) -> FastAPI:
+    app = FastAPI()
+    recording = Recording(fixtures)
+    rng = random.Random(seed)
+    client = httpx.AsyncClient(base_url=upstream) if upstream else None
+
+    async def handle(call: dict) -> dict:
+        method, params = call["method"], call.get("params", [])
+        delay = (method_latencies or {}).get(method, latency)
+        if delay or jitter:
+            await asyncio.sleep(delay + rng.uniform(0, jitter))
+
+        if client is not None:
+            response = (await client.post("", json=call)).json()
+            recording.add_response(method, params, response)
+        else:
+            response = recording.get_response(method, params) or {
+                "error": {
+                    "code": NO_RECORDED_RESPONSE,
+                    "message": f"No recorded response for {method}",
+                }
+            }
+
+        return {"jsonrpc": "2.0", "id": call.get("id"), **response}
+
+    @app.post("/")
+    async def rpc(request: Request):
+        body = await request.json()
+        if isinstance(body, list):
+            return await asyncio.gather(*(handle(call) for call in body))
+        return await handle(body)
+
+    @app.on_event("shutdown")
+    async def save_recording():
+        if client is not None:
+            await client.aclose()
+            recording.save()
+
+    app.state.recording = recording
+    return app
+
+
+def parse_method_latencies(values: list[str]) -> dict[str, float]:
+    method_latencies = {}
+    for value in values:
+        method, _, milliseconds = value.partition("=")
+        method_latencies[method] = float(milliseconds) / 1000
+    return method_latencies
+
+
+@cli.command(
+    help="Replay recorded JSON-RPC responses from a fixture file, injecting "
+    "the given latency"
+)
+def replay(
+    fixtures: Path,
+    port: int = 8546,
+    latency: float = typer.Option(0, help="Latency in milliseconds"),
+    jitter: float = typer.Option(0, help="Maximum extra random latency in ms"),
+    method_latency: list[str] = typer.Option(
+        [], help="Per-method latency override, e.g. debug_traceCall=50"
+    ),
+    seed: int = 0,
+):
+    app = create_app(
+        fixtures,
+        latency=latency / 1000,
+        jitter=jitter / 1000,
+        method_latencies=parse_method_latencies(method_latency),
+        seed=seed,
+    )
+    uvicorn.run(app, host="127.0.0.1", port=port)
+
+
+@cli.command(
+    help="Proxy JSON-RPC calls to the upstream node and record the responses "
+    "to a fixture file on shutdown"
+)
+def record(fixtures: Path, upstream: str, port: int = 8546):
+    uvicorn.run(
+        create_app(fixtures, upstream=upstream), host="127.0.0.1", port=port
+    )
+
+
+if __name__ == "__main__":
+    cli()
@@ -16,6 +16,9 @@ from web3 import Web3
 
 import db.service
 import db.utils
+import utils.client
+import utils.rpc_pool
+import utils.validation
 import utils.web3
 from db.base import engine, async_session, Base
 from tests.utils.common_classes import TestClient, TestSendRequest
@@ -39,6 +42,7 @@ async def session(init_models, contracts) -> AsyncGenerator[AsyncSession, None]:
     async with async_session() as session:
         for name, table in Base.metadata.tables.items():
             await session.execute(delete(table))
+        utils.validation.pool_sizes.clear()
         await db.service.update_entry_point(
             session, contracts.entry_point.address, True
         )
@@ -49,7 +53,11 @@ async def session(init_models, contracts) -> AsyncGenerator[AsyncSession, None]:
 
 @pytest_asyncio.fixture(scope="function")
 async def client() -> TestClient:
-    utils.web3.w3 = Web3(Web3.HTTPProvider(brownie.web3.provider.endpoint_uri))
+    utils.web3.w3 = Web3(
+        utils.rpc_pool.InstrumentedHTTPProvider(
+            brownie.web3.provider.endpoint_uri
+        )
+    )
     from app.main import app
 
     async with AsyncClient(
@@ -89,7 +97,9 @@ def send_request_with_expire_paymaster(contracts, signer, send_request):
         send_request.user_op.paymaster_and_data = (
             contracts.test_expire_paymaster.address + time_range.hex()
         )
-        send_request.user_op.sign(signer, contracts.entry_point)
+        utils.client.sign_user_op(
+            send_request.user_op, signer, contracts.entry_point
+        )
 
         return send_request
 
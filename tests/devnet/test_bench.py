@@ -0,0 +1,27 @@
+import brownie
+import pytest
+
+import utils.bench
+
+
+def test_computes_user_op_hash_locally(contracts, send_request):
+    user_op = send_request.user_op
+
+    assert user_op.get_hash(
+        contracts.entry_point.address, brownie.chain.id
+    ) == contracts.entry_point.getUserOpHash(user_op.values())
+
+
+@pytest.mark.asyncio
+async def test_builds_valid_user_ops(client, contracts, signer):
+    send_requests = utils.bench.build_send_requests(
+        brownie.web3.provider.endpoint_uri,
+        contracts.entry_point.address,
+        contracts.simple_account_factory.address,
+        contracts.test_paymaster_accept_all.address,
+        signer,
+        count=2,
+    )
+
+    for send_request in send_requests:
+        await client.send_user_op(send_request.json())
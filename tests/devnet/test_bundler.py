@@ -0,0 +1,109 @@
+import time
+from unittest.mock import patch
+
+import pytest
+import pytest_asyncio
+from brownie import accounts
+
+import db.service
+import utils.bundler
+import utils.web3
+
+
+@pytest_asyncio.fixture(scope="function")
+async def trust_contracts(session, contracts):
+    await db.service.update_bytecode_from_address(
+        session, contracts.simple_account_factory.address, True
+    )
+    await db.service.update_bytecode_from_address(
+        session, contracts.test_paymaster_accept_all.address, True
+    )
+    await session.commit()
+
+    return contracts
+
+
+@pytest.mark.asyncio
+async def test_builds_bundle_executable_by_entry_point(
+    client,
+    session,
+    contracts,
+    signer,
+    send_request,
+    send_request2,
+    trust_contracts,
+):
+    user_op_hashes = [
+        await client.send_user_op(send_request.json()),
+        await client.send_user_op(send_request2.json()),
+    ]
+
+    bundles = await utils.bundler.build_bundles(session, signer.address)
+    assert len(bundles) == 1
+    assert [user_op.hash for user_op in bundles[0].user_ops] == user_op_hashes
+
+    tx = accounts[0].transfer(
+        contracts.entry_point, 0, data=bundles[0].call_data
+    )
+    for user_op_hash in user_op_hashes:
+        receipt = await client.get_user_op_receipt(user_op_hash)
+        assert receipt["tx_hash"] == tx.txid
+        assert receipt["accepted"] == True
+
+
+@pytest.mark.asyncio
+async def test_builds_bundle_within_gas_limit(
+    client, session, signer, send_request, send_request2, trust_contracts
+):
+    user_op_hash = await client.send_user_op(send_request.json())
+    await client.send_user_op(send_request2.json())
+
+    user_op = await db.service.get_user_op_by_hash(session, user_op_hash)
+    bundles = await utils.bundler.build_bundles(
+        session, signer.address, gas_limit=user_op.get_required_gas()
+    )
+    assert [user_op.hash for user_op in bundles[0].user_ops] == [user_op_hash]
+
+
+@pytest.mark.asyncio
+async def test_excludes_user_ops_failing_bundle_simulation(
+    client, session, contracts, signer, send_request
+):
+    await client.send_user_op(send_request.json())
+    contracts.test_paymaster_accept_all.withdrawTo(
+        signer.address,
+        contracts.test_paymaster_accept_all.getDeposit(),
+    )
+
+    with patch.object(utils.web3, "call", wraps=utils.web3.call) as call:
+        bundles = await utils.bundler.build_bundles(session, signer.address)
+    assert len(bundles) == 0
+    # The UserOp fails on its own, so the bundle is never simulated
+    assert call.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_builds_no_bundle_when_simulation_fails_without_revert_data(
+    client, session, signer, send_request, trust_contracts
+):
+    await client.send_user_op(send_request.json())
+
+    with patch.object(
+        utils.web3,
+        "call",
+        return_value=(None, {"code": -32000, "message": "header not found"}),
+    ):
+        bundles = await utils.bundler.build_bundles(session, signer.address)
+    assert len(bundles) == 0
+
+
+@pytest.mark.asyncio
+async def test_excludes_user_ops_not_valid_yet(
+    client, session, signer, send_request_with_expire_paymaster
+):
+    now = int(time.time())
+    send_request = send_request_with_expire_paymaster(now + 300, now + 600)
+    await client.send_user_op(send_request.json())
+
+    bundles = await utils.bundler.build_bundles(session, signer.address)
+    assert len(bundles) == 0
@@ -0,0 +1,48 @@
+from unittest.mock import patch
+
+import pytest
+
+import db.service
+import utils.bytecode
+import utils.web3
+from app.config import settings
+
+
+def test_skips_push_data_when_disassembling():
+    # PUSH1 TIMESTAMP, PUSH2 CALL CALL, GAS, STATICCALL
+    bytecode = bytes.fromhex("604261f1f15afa")
+    assert utils.bytecode.disassemble(bytecode) == ["GAS", "STATICCALL"]
+
+
+def test_evicts_least_recently_used_restricted_opcodes():
+    utils.bytecode.restricted_opcodes.clear()
+    with patch.object(settings, "restricted_opcodes_cache_size", 2):
+        utils.bytecode.remember("0x01", [])
+        utils.bytecode.remember("0x02", ["GAS"])
+        utils.bytecode.lookup("0x01")
+        utils.bytecode.remember("0x03", [])
+
+    assert list(utils.bytecode.restricted_opcodes) == ["0x01", "0x03"]
+
+
+@pytest.mark.asyncio
+async def test_stores_restricted_opcodes_of_helper_contracts(
+    client, session, contracts
+):
+    address = contracts.simple_account_factory.address
+    bytecode_hash = utils.web3.get_bytecode_hash(address)
+    utils.bytecode.restricted_opcodes.pop(bytecode_hash, None)
+
+    restricted_opcodes = await utils.bytecode.get_restricted_opcodes(
+        session, [(address, bytecode_hash)]
+    )
+    assert "CREATE2" in restricted_opcodes[bytecode_hash]
+    assert (
+        await db.service.get_restricted_opcodes(session, [bytecode_hash]) == {}
+    )
+
+    await utils.bytecode.flush(session)
+    assert await db.service.get_restricted_opcodes(
+        session, [bytecode_hash]
+    ) == {bytecode_hash: restricted_opcodes[bytecode_hash]}
+    assert utils.bytecode.pending_restricted_opcodes == {}
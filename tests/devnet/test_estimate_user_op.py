@@ -1,4 +1,5 @@
 import time
+from unittest.mock import patch
 
 import pytest
 
@@ -26,6 +27,20 @@ async def test_estimates_user_op(client, contracts, send_request):
     assert user_op_gas_estimation["call_gas_limit"] == call_gas_limit
 
 
+@pytest.mark.asyncio
+async def test_estimates_user_op_without_tracing(client, send_request):
+    provider = utils.web3.w3.provider
+    with patch.object(
+        provider, "make_request", wraps=provider.make_request
+    ) as make_request:
+        await client.estimate_user_op(send_request.json())
+
+    methods = [call.args[0] for call in make_request.call_args_list]
+    assert "debug_traceCall" not in methods
+    assert "eth_call" in methods
+    assert "eth_estimateGas" in methods
+
+
 @pytest.mark.asyncio
 async def test_estimates_user_op_without_gas_fields(
     client, send_request, send_request2
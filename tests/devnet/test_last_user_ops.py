@@ -5,6 +5,7 @@ import pytest
 import pytest_asyncio
 
 import db.service
+import utils.client
 from app.config import settings
 
 
@@ -67,7 +68,9 @@ async def test_not_returns_user_ops_using_prohibited_bytecodes(
     send_request2.user_op.paymaster_and_data = (
         contracts.test_expire_paymaster.address + 128 * "0"
     )
-    send_request2.user_op.sign(signer, contracts.entry_point)
+    utils.client.sign_user_op(
+        send_request2.user_op, signer, contracts.entry_point
+    )
     await client.send_user_op(send_request2.json())
 
     await db.service.update_bytecode_from_address(
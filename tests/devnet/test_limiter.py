@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+import pytest_asyncio
+
+import db.service
+import utils.limiter
+from utils.limiter import AdaptiveLimiter
+
+
+@pytest.mark.asyncio
+async def test_limits_in_flight_calls():
+    limiter = AdaptiveLimiter(
+        2, max_queue_size=10, target_latency=1, name="test"
+    )
+    in_flight = []
+
+    def call():
+        in_flight.append(limiter.in_flight)
+        time.sleep(0.01)
+
+    await asyncio.gather(*[limiter.run(call) for _ in range(6)])
+    assert max(in_flight) == 2
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_halves_limit_on_slow_calls():
+    limiter = AdaptiveLimiter(
+        8, max_queue_size=10, target_latency=0.01, name="test"
+    )
+    await limiter.run(time.sleep, 0.02)
+    assert limiter.limit == 4
+
+
+@pytest.mark.asyncio
+async def test_measures_latency_without_queueing_time():
+    limiter = AdaptiveLimiter(
+        2, max_queue_size=10, target_latency=0.03, name="test"
+    )
+    # Every call is fast, but the later ones wait for a slot
+    await asyncio.gather(*[limiter.run(time.sleep, 0.02) for _ in range(6)])
+    assert limiter.limit == 2
+
+
+@pytest_asyncio.fixture
+async def saturated_trace_lane():
+    limiter = AdaptiveLimiter(
+        1, max_queue_size=0, target_latency=1, name=utils.limiter.TRACE
+    )
+    released = threading.Event()
+    with patch.dict(
+        utils.limiter.simulation_limiters, {utils.limiter.TRACE: limiter}
+    ):
+        # Holds both the only slot and the only thread of the lane
+        call = asyncio.create_task(limiter.run(released.wait))
+        await asyncio.sleep(0)
+        yield limiter
+        released.set()
+        await call
+
+
+@pytest.mark.asyncio
+async def test_rejects_user_op_when_simulation_queue_is_full(
+    client, send_request, saturated_trace_lane
+):
+    await client.send_user_op(
+        send_request.json(),
+        expected_error_message="The node is overloaded",
+    )
+
+
+@pytest.mark.asyncio
+async def test_accepts_trusted_user_op_when_trace_lane_is_saturated(
+    client, session, contracts, send_request, saturated_trace_lane
+):
+    await db.service.update_bytecode_from_address(
+        session, contracts.simple_account_factory.address, True
+    )
+    await db.service.update_bytecode_from_address(
+        session, contracts.test_paymaster_accept_all.address, True
+    )
+    await session.commit()
+
+    await client.send_user_op(send_request.json())
+
+
+@pytest.mark.asyncio
+async def test_estimates_user_op_when_trace_lane_is_saturated(
+    client, send_request, saturated_trace_lane
+):
+    await client.estimate_user_op(send_request.json())
@@ -0,0 +1,39 @@
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_exposes_stage_durations_and_rejections(client, send_request):
+    await client.send_user_op(send_request.json())
+    await client.send_user_op(
+        send_request.json(), expected_error_message="already in the pool"
+    )
+
+    response = await client.client.get("https://localhost/metrics")
+    assert response.status_code == 200
+    for sample in (
+        'mempool_stage_duration_seconds_count{method="eth_sendUserOperation",'
+        'outcome="ok",stage="simulation_rpc"}',
+        'mempool_stage_duration_seconds_count{method="eth_sendUserOperation",'
+        'outcome="ok",stage="db_select"}',
+        'mempool_rejections_total{method="eth_sendUserOperation",'
+        'reason="UserOp is already in the pool."}',
+    ):
+        assert sample in response.text
+
+
+@pytest.mark.asyncio
+async def test_returns_timing_header_on_debug_request(client, send_request):
+    response = await client.client.post(
+        "eth_sendUserOperation",
+        json=send_request.json(),
+        headers={"X-Mempool-Debug": "1"},
+    )
+
+    timing = response.headers["X-Mempool-Timing"]
+    rpc_count = int(timing.split("rpc;count=")[1].split(";")[0])
+    db_count = int(timing.split("db;count=")[1].split(";")[0])
+    assert rpc_count > 0
+    assert db_count > 0
+
+    response = await client.client.post("eth_supportedEntryPoints", json={})
+    assert "X-Mempool-Timing" not in response.headers
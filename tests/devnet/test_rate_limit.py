@@ -0,0 +1,24 @@
+import utils.rate_limit
+
+
+def test_shares_slot_secret_between_workers(tmp_path):
+    path = str(tmp_path / "rate_limit")
+    token_buckets = utils.rate_limit.TokenBuckets(1024, path)
+    other_token_buckets = utils.rate_limit.TokenBuckets(1024, path)
+
+    keys = [f"sender:0x{i:040x}" for i in range(32)]
+    assert [token_buckets.get_slot(key) for key in keys] == [
+        other_token_buckets.get_slot(key) for key in keys
+    ]
+    assert token_buckets.consume(keys[0], 0.001, 1)
+    assert not other_token_buckets.consume(keys[0], 0.001, 1)
+
+
+def test_keys_slots_with_a_random_secret():
+    token_buckets = utils.rate_limit.TokenBuckets(1024)
+    other_token_buckets = utils.rate_limit.TokenBuckets(1024)
+
+    keys = [f"sender:0x{i:040x}" for i in range(32)]
+    assert [token_buckets.get_slot(key) for key in keys] != [
+        other_token_buckets.get_slot(key) for key in keys
+    ]
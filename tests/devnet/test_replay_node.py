@@ -0,0 +1,34 @@
+import brownie
+import httpx
+import pytest
+
+from scripts.replay_node import create_app
+
+
+async def call(app, method: str, params: list) -> dict:
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://replay"
+    ) as client:
+        response = await client.post(
+            "/",
+            json={
+                "jsonrpc": "2.0",
+                "id": 1,
+                "method": method,
+                "params": params,
+            },
+        )
+        return response.json()
+
+
+@pytest.mark.asyncio
+async def test_replays_recorded_responses(tmp_path, contracts):
+    fixtures = tmp_path / "rpc.json"
+    params = [contracts.entry_point.address, "latest"]
+    recorder = create_app(fixtures, upstream=brownie.web3.provider.endpoint_uri)
+    recorded = await call(recorder, "eth_getCode", params)
+    recorder.state.recording.save()
+
+    replayer = create_app(fixtures)
+    assert await call(replayer, "eth_getCode", params) == recorded
+    assert "error" in await call(replayer, "eth_getCode", [params[0], "0x1"])
@@ -0,0 +1,142 @@
+from unittest.mock import patch
+
+import pytest
+from brownie import chain
+
+import utils.reputation
+import utils.revalidation
+import utils.web3
+from app.config import settings
+
+
+@pytest.fixture(autouse=True)
+def tracker():
+    tracker = utils.reputation.ReputationTracker()
+    with patch.object(utils.reputation, "tracker", tracker):
+        yield tracker
+
+
+def see(tracker, address, count):
+    tracker.seen([(address, "0x")] * count)
+
+
+@pytest.mark.asyncio
+async def test_counts_seen_user_ops_for_helper_contracts(
+    client, contracts, tracker, send_request
+):
+    await client.send_user_op(send_request.json())
+
+    for address in (
+        contracts.simple_account_factory.address,
+        contracts.test_paymaster_accept_all.address,
+    ):
+        assert tracker._deltas[address] == [1, 0]
+
+
+@pytest.mark.asyncio
+async def test_rejects_user_op_with_banned_paymaster(
+    client, contracts, tracker, send_request
+):
+    see(
+        tracker,
+        contracts.test_paymaster_accept_all.address,
+        settings.reputation_min_inclusion_rate_denominator
+        * (settings.reputation_ban_slack + 1),
+    )
+    assert (
+        tracker.get_status(contracts.test_paymaster_accept_all.address)
+        == utils.reputation.BANNED
+    )
+
+    await client.send_user_op(
+        send_request.json(),
+        expected_error_message="is banned due to its reputation",
+    )
+
+
+@pytest.mark.asyncio
+async def test_limits_user_ops_with_throttled_paymaster(
+    client, contracts, tracker, send_request
+):
+    see(
+        tracker,
+        contracts.test_paymaster_accept_all.address,
+        settings.reputation_min_inclusion_rate_denominator
+        * (settings.reputation_throttling_slack + 1),
+    )
+    assert (
+        tracker.get_status(contracts.test_paymaster_accept_all.address)
+        == utils.reputation.THROTTLED
+    )
+
+    with patch.object(settings, "throttled_entity_mempool_count", 1):
+        await client.send_user_op(send_request.json())
+
+        send_request.user_op.nonce += 1
+        await client.send_user_op(
+            send_request.json(),
+            expected_error_message="is throttled due to its reputation",
+        )
+
+
+@pytest.mark.asyncio
+async def test_counts_included_user_ops_from_logs(
+    client, session, contracts, signer, tracker, send_request
+):
+    await client.send_user_op(send_request.json())
+    contracts.entry_point.handleOps(
+        [send_request.user_op.values()], signer.address
+    )
+    await utils.revalidation.revalidate_user_ops(
+        session, chain.height, chain.height
+    )
+
+    assert tracker._deltas[contracts.test_paymaster_accept_all.address] == [
+        1,
+        1,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_counts_included_user_ops_once_when_receipt_was_read(
+    client, session, contracts, signer, tracker, send_request
+):
+    user_op_hash = await client.send_user_op(send_request.json())
+    contracts.entry_point.handleOps(
+        [send_request.user_op.values()], signer.address
+    )
+    await client.get_user_op_receipt(user_op_hash)
+    assert tracker._deltas[contracts.test_paymaster_accept_all.address] == [
+        1,
+        0,
+    ]
+
+    await utils.revalidation.revalidate_user_ops(
+        session, chain.height, chain.height
+    )
+    assert tracker._deltas[contracts.test_paymaster_accept_all.address] == [
+        1,
+        1,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_counts_included_user_ops_for_bytecodes_seen_by_other_worker(
+    client, session, contracts, signer, tracker, send_request
+):
+    await client.send_user_op(send_request.json())
+    contracts.entry_point.handleOps(
+        [send_request.user_op.values()], signer.address
+    )
+    # The logs are indexed by a worker that did not admit the UserOp
+    with patch.object(
+        utils.reputation, "tracker", utils.reputation.ReputationTracker()
+    ) as other_tracker:
+        await utils.revalidation.revalidate_user_ops(
+            session, chain.height, chain.height
+        )
+
+    bytecode_hash = utils.web3.get_bytecode_hash(
+        contracts.test_paymaster_accept_all.address
+    )
+    assert other_tracker._deltas[bytecode_hash] == [0, 1]
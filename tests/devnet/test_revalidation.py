@@ -0,0 +1,113 @@
+from unittest.mock import patch
+
+import pytest
+from brownie import accounts, chain
+
+import db.service
+import utils.revalidation
+from db.base import async_session
+
+
+@pytest.mark.asyncio
+async def test_removes_user_op_invalidated_by_new_block(
+    client, session, contracts, send_request
+):
+    user_op_hash = await client.send_user_op(send_request.json())
+
+    paymaster = contracts.test_paymaster_accept_all
+    paymaster.withdrawTo(
+        accounts[0], paymaster.getDeposit(), {"from": accounts[0]}
+    )
+    removed_user_op_ids = await utils.revalidation.revalidate_user_ops(
+        session, chain.height, chain.height
+    )
+    await session.commit()
+
+    assert len(removed_user_op_ids) == 1
+    assert await db.service.get_user_op_by_hash(session, user_op_hash) is None
+
+
+@pytest.mark.asyncio
+async def test_keeps_valid_user_op_touched_by_new_block(
+    client, session, contracts, send_request
+):
+    user_op_hash = await client.send_user_op(send_request.json())
+
+    contracts.entry_point.depositTo(
+        contracts.test_paymaster_accept_all.address,
+        {"from": accounts[0], "value": "1 ether"},
+    )
+    removed_user_op_ids = await utils.revalidation.revalidate_user_ops(
+        session, chain.height, chain.height
+    )
+
+    assert removed_user_op_ids == []
+    assert (
+        await db.service.get_user_op_by_hash(session, user_op_hash) is not None
+    )
+
+
+@pytest.mark.asyncio
+async def test_marks_included_user_op_instead_of_revalidating_it(
+    client, session, contracts, signer, send_request
+):
+    user_op_hash = await client.send_user_op(send_request.json())
+    tx = contracts.entry_point.handleOps(
+        [send_request.user_op.values()], signer.address
+    )
+
+    removed_user_op_ids = await utils.revalidation.revalidate_user_ops(
+        session, chain.height, chain.height
+    )
+    await session.commit()
+
+    assert removed_user_op_ids == []
+    user_op = await db.service.get_user_op_by_hash(session, user_op_hash)
+    assert user_op.tx_hash == tx.txid
+    assert user_op.accepted
+    receipt = await client.get_user_op_receipt(user_op_hash)
+    assert receipt["tx_hash"] == tx.txid
+
+
+@pytest.mark.asyncio
+async def test_revalidates_from_last_stored_block(session):
+    await db.service.set_checkpoint(
+        session, utils.revalidation.CHECKPOINT, chain.height - 5
+    )
+    await session.commit()
+
+    with patch.object(
+        utils.revalidation, "revalidate_user_ops", return_value=[]
+    ) as revalidate_user_ops:
+        assert await utils.revalidation.revalidate_new_blocks(
+            session, chain.height
+        )
+    revalidate_user_ops.assert_called_once_with(
+        session, chain.height - 4, chain.height
+    )
+    assert (
+        await db.service.get_checkpoint(session, utils.revalidation.CHECKPOINT)
+        == chain.height
+    )
+
+
+@pytest.mark.asyncio
+async def test_keeps_last_block_when_revalidation_is_locked(session):
+    await db.service.set_checkpoint(
+        session, utils.revalidation.CHECKPOINT, chain.height - 5
+    )
+    await session.commit()
+
+    async with async_session() as other_session:
+        assert await db.service.try_advisory_lock(
+            other_session, utils.revalidation.ADVISORY_LOCK_KEY
+        )
+        assert not await utils.revalidation.revalidate_new_blocks(
+            session, chain.height
+        )
+        await session.rollback()
+
+    assert (
+        await db.service.get_checkpoint(session, utils.revalidation.CHECKPOINT)
+        == chain.height - 5
+    )
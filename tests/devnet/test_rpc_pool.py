@@ -0,0 +1,85 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import brownie
+import pytest
+
+import utils.rpc_pool
+
+UNREACHABLE_ENDPOINT = "http://127.0.0.1:1"
+
+
+@pytest.fixture
+def endpoint():
+    return brownie.web3.provider.endpoint_uri
+
+
+def test_fails_over_to_healthy_endpoint(endpoint):
+    provider = utils.rpc_pool.PooledHTTPProvider(
+        {UNREACHABLE_ENDPOINT: 100, endpoint: 1}
+    )
+
+    response = provider.make_request("eth_blockNumber", [])
+    assert int(response["result"], 16) == brownie.chain.height
+    assert not provider.endpoints[0].healthy
+
+    provider.make_request("eth_blockNumber", [])
+    assert provider.get_endpoints("eth_blockNumber")[0].uri == endpoint
+
+
+def test_routes_to_endpoint_supporting_method(endpoint):
+    provider = utils.rpc_pool.PooledHTTPProvider({endpoint: 1})
+    provider.endpoints[0].unsupported_methods.add("eth_chainId")
+
+    response = provider.make_request("eth_chainId", [])
+    assert int(response["result"], 16) == brownie.chain.id
+
+
+def test_hedges_slow_read_requests(endpoint):
+    provider = utils.rpc_pool.PooledHTTPProvider(
+        {endpoint: 1, UNREACHABLE_ENDPOINT: 1}, hedge_requests=True
+    )
+    provider.endpoints[0].latencies.extend(
+        [0] * utils.rpc_pool.MIN_LATENCY_SAMPLES
+    )
+
+    response = provider.make_request("eth_blockNumber", [])
+    assert int(response["result"], 16) == brownie.chain.height
+
+
+def test_returns_successful_hedged_response_when_other_fails(endpoint):
+    provider = utils.rpc_pool.PooledHTTPProvider(
+        {endpoint: 1, UNREACHABLE_ENDPOINT: 1}, hedge_requests=True
+    )
+    provider.endpoints[0].latencies.extend(
+        [0] * utils.rpc_pool.MIN_LATENCY_SAMPLES
+    )
+    primary_endpoint = provider.get_endpoints("eth_blockNumber")[0]
+
+    def make_request(endpoints, method, params):
+        # Both requests complete at about the same time
+        time.sleep(0.05)
+        if endpoints[0] is primary_endpoint:
+            raise ConnectionError
+        return {"result": "0x1"}
+
+    with patch.object(provider, "_make_request", side_effect=make_request):
+        response = provider.make_request("eth_blockNumber", [])
+    assert response == {"result": "0x1"}
+
+
+def test_does_not_hedge_traces():
+    assert "debug_traceCall" not in utils.rpc_pool.HEDGED_METHODS
+
+
+def test_counts_in_flight_requests_from_many_threads(endpoint):
+    endpoint = utils.rpc_pool.Endpoint(endpoint, 1)
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        list(
+            executor.map(
+                lambda _: endpoint.make_request("eth_blockNumber", []),
+                range(200),
+            )
+        )
+    assert endpoint.in_flight == 0
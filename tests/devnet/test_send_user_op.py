@@ -1,3 +1,4 @@
+import asyncio
 import copy
 import datetime
 import time
@@ -7,8 +8,11 @@ import pytest
 
 import app.constants as constants
 import db.service
+import utils.client
+import utils.rate_limit
 import utils.web3
 from app.config import settings
+from tests.utils.common_classes import TestSendRequest
 
 
 @pytest.mark.asyncio
@@ -152,20 +156,74 @@ async def test_rejects_same_user_op_with_different_signature(
 
 
 @pytest.mark.asyncio
-async def test_replaces_user_op_with_same_sender(client, send_request):
+async def test_keeps_user_ops_with_same_sender_and_different_nonces(
+    client, send_request
+):
     user_op_1_hash = await client.send_user_op(send_request.json())
 
     send_request.user_op.nonce += 1
     user_op_2_hash = await client.send_user_op(send_request.json())
 
+    for user_op_hash in (user_op_1_hash, user_op_2_hash):
+        user_op = await client.get_user_op(user_op_hash)
+        assert user_op["hash"] == user_op_hash
+
+
+@pytest.mark.asyncio
+async def test_replaces_user_op_with_same_sender_and_nonce(
+    client, contracts, signer, send_request
+):
+    user_op_1_hash = await client.send_user_op(send_request.json())
+
+    for field in ("max_fee_per_gas", "max_priority_fee_per_gas"):
+        value = getattr(send_request.user_op, field)
+        setattr(
+            send_request.user_op,
+            field,
+            value * (100 + settings.min_replacement_fee_bump) // 100 + 1,
+        )
+    utils.client.sign_user_op(
+        send_request.user_op, signer, contracts.entry_point
+    )
+    user_op_2_hash = await client.send_user_op(send_request.json())
+
     await client.get_user_op(
         user_op_1_hash, expected_error_message="The UserOp does not exist"
     )
-
     user_op = await client.get_user_op(user_op_2_hash)
     assert user_op["hash"] == user_op_2_hash
 
 
+@pytest.mark.asyncio
+async def test_rejects_replacement_user_op_without_fee_bump(
+    client, contracts, signer, send_request
+):
+    await client.send_user_op(send_request.json())
+
+    send_request.user_op.max_fee_per_gas += 1
+    utils.client.sign_user_op(
+        send_request.user_op, signer, contracts.entry_point
+    )
+    await client.send_user_op(
+        send_request.json(),
+        expected_error_message="The pool already has a UserOp with the same "
+        "sender and nonce",
+    )
+
+
+@pytest.mark.asyncio
+async def test_rejects_user_op_exceeding_sender_limit(client, send_request):
+    with patch.object(settings, "max_user_ops_per_sender", 1):
+        await client.send_user_op(send_request.json())
+
+        send_request.user_op.nonce += 1
+        await client.send_user_op(
+            send_request.json(),
+            expected_error_message="The sender already has the maximum number "
+            "of UserOps in the pool",
+        )
+
+
 @pytest.mark.asyncio
 async def test_rejects_user_op_without_contract_address_in_sender_and_init_code(
     client, signer, send_request
@@ -488,7 +546,9 @@ async def test_rejects_user_op_with_prohibited_aggregator(
             signer.address, salt
         )[2:]
     )
-    send_request.user_op.sign(signer, contracts.entry_point)
+    utils.client.sign_user_op(
+        send_request.user_op, signer, contracts.entry_point
+    )
 
     await db.service.update_bytecode_from_address(
         session, contracts.aggregator.address, False
@@ -532,6 +592,53 @@ async def test_marks_user_op_trusted_if_all_bytecodes_are_trusted(
     assert user_op["is_trusted"]
 
 
+@pytest.mark.asyncio
+async def test_simulates_trusted_user_op_without_trace(
+    client, session, contracts, send_request
+):
+    await db.service.update_bytecode_from_address(
+        session, contracts.simple_account_factory.address, True
+    )
+    await db.service.update_bytecode_from_address(
+        session, contracts.test_paymaster_accept_all.address, True
+    )
+    await session.commit()
+
+    with patch.object(
+        utils.web3,
+        "call_simulate_validation",
+        wraps=utils.web3.call_simulate_validation,
+    ) as call_simulate_validation:
+        await client.send_user_op(send_request.json())
+    assert call_simulate_validation.call_args.kwargs["trace"] is False
+
+
+@pytest.mark.asyncio
+async def test_simulates_not_trusted_user_op_with_trace(client, send_request):
+    with patch.object(
+        utils.web3,
+        "call_simulate_validation",
+        wraps=utils.web3.call_simulate_validation,
+    ) as call_simulate_validation:
+        await client.send_user_op(send_request.json())
+    assert call_simulate_validation.call_args.kwargs["trace"] is True
+
+
+@pytest.mark.asyncio
+async def test_coalesces_concurrent_duplicate_user_ops(client, send_request):
+    with patch.object(
+        utils.web3,
+        "call_simulate_validation",
+        wraps=utils.web3.call_simulate_validation,
+    ) as call_simulate_validation:
+        user_op_hashes = await asyncio.gather(
+            client.send_user_op(send_request.json()),
+            client.send_user_op(send_request.json()),
+        )
+    assert user_op_hashes[0] == user_op_hashes[1]
+    assert call_simulate_validation.call_count == 1
+
+
 @pytest.mark.asyncio
 async def test_rejects_user_op_using_not_trusted_bytecode_already_in_pool(
     client, send_request, send_request2
@@ -571,3 +678,122 @@ async def test_accepts_user_op_using_not_trusted_bytecode_expired_in_pool(
         await client.send_user_op(send_request.json())
 
     await client.send_user_op(send_request2.json())
+
+
+@pytest.mark.asyncio
+async def test_evicts_user_op_with_lowest_fee_when_pool_is_full(
+    client, session, contracts, signer, send_request, send_request2
+):
+    await db.service.update_bytecode_from_address(
+        session, contracts.simple_account_factory.address, True
+    )
+    await db.service.update_bytecode_from_address(
+        session, contracts.test_paymaster_accept_all.address, True
+    )
+    await session.commit()
+
+    with patch.object(settings, "max_pool_size", 1):
+        user_op_1_hash = await client.send_user_op(send_request.json())
+
+        send_request2.user_op.max_priority_fee_per_gas += 1
+        send_request2.user_op.max_fee_per_gas += 1
+        utils.client.sign_user_op(
+            send_request2.user_op, signer, contracts.entry_point
+        )
+        user_op_2_hash = await client.send_user_op(send_request2.json())
+
+    await client.get_user_op(
+        user_op_1_hash, expected_error_message="The UserOp does not exist"
+    )
+    await client.get_user_op(user_op_2_hash)
+
+
+@pytest.mark.asyncio
+async def test_evicts_one_user_op_when_both_pools_are_full(
+    client, session, contracts, signer, send_request, send_request2
+):
+    await db.service.update_bytecode_from_address(
+        session, contracts.simple_account_factory.address, True
+    )
+    await db.service.update_bytecode_from_address(
+        session, contracts.test_paymaster_accept_all.address, True
+    )
+    await session.commit()
+    send_request3 = TestSendRequest(
+        contracts.entry_point,
+        contracts.simple_account_factory,
+        contracts.test_paymaster_accept_all,
+        signer,
+        3,
+    )
+
+    with patch.object(settings, "max_pool_size", 2), patch.object(
+        settings, "max_pool_size_per_entry_point", 2
+    ):
+        user_op_1_hash = await client.send_user_op(send_request.json())
+        send_request2.user_op.max_priority_fee_per_gas += 1
+        send_request2.user_op.max_fee_per_gas += 1
+        utils.client.sign_user_op(
+            send_request2.user_op, signer, contracts.entry_point
+        )
+        user_op_2_hash = await client.send_user_op(send_request2.json())
+
+        send_request3.user_op.max_priority_fee_per_gas += 2
+        send_request3.user_op.max_fee_per_gas += 2
+        utils.client.sign_user_op(
+            send_request3.user_op, signer, contracts.entry_point
+        )
+        user_op_3_hash = await client.send_user_op(send_request3.json())
+
+    await client.get_user_op(
+        user_op_1_hash, expected_error_message="The UserOp does not exist"
+    )
+    await client.get_user_op(user_op_2_hash)
+    await client.get_user_op(user_op_3_hash)
+    assert await db.service.count_user_ops(session, 10) == 2
+
+
+@pytest.mark.asyncio
+async def test_rejects_user_op_with_low_fee_when_pool_is_full(
+    client, session, contracts, send_request, send_request2
+):
+    await db.service.update_bytecode_from_address(
+        session, contracts.simple_account_factory.address, True
+    )
+    await db.service.update_bytecode_from_address(
+        session, contracts.test_paymaster_accept_all.address, True
+    )
+    await session.commit()
+
+    with patch.object(settings, "max_pool_size_per_entry_point", 1):
+        await client.send_user_op(send_request.json())
+        with patch.object(
+            utils.web3,
+            "call_simulate_validation",
+            wraps=utils.web3.call_simulate_validation,
+        ) as call_simulate_validation:
+            await client.send_user_op(
+                send_request2.json(),
+                expected_error_message="The pool is full and "
+                "'max_priority_fee_per_gas' is not higher than that of any "
+                "UserOp in the pool",
+            )
+        call_simulate_validation.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_rejects_user_ops_exceeding_sender_rate_limit(
+    client, send_request
+):
+    with patch.object(
+        utils.rate_limit, "token_buckets", utils.rate_limit.TokenBuckets(16)
+    ), patch.object(settings, "rate_limit_sender", 0.001), patch.object(
+        settings, "rate_limit_sender_burst", 1
+    ):
+        await client.send_user_op(send_request.json())
+
+        send_request.user_op.nonce += 1
+        await client.send_user_op(
+            send_request.json(),
+            expected_error_message="Too many requests for the sender",
+        )
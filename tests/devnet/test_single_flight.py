@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+import utils.single_flight
+
+
+@pytest.mark.asyncio
+async def test_shares_result_of_concurrent_calls():
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    assert await asyncio.gather(
+        *[utils.single_flight.run("key", work) for _ in range(3)]
+    ) == [1, 1, 1]
+
+
+@pytest.mark.asyncio
+async def test_waiter_takes_over_when_leader_is_cancelled():
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    leader = asyncio.create_task(utils.single_flight.run("key", work))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(utils.single_flight.run("key", work))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await waiter == 2
+    assert "key" not in utils.single_flight.calls
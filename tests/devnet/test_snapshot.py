@@ -0,0 +1,52 @@
+import gzip
+
+import pytest
+from sqlalchemy import delete
+
+import db.service
+import db.snapshot
+from db.base import Base
+
+
+@pytest.mark.asyncio
+async def test_restores_pool_from_snapshot(
+    client, session, tmp_path, send_request, send_request2
+):
+    user_op_hashes = [
+        await client.send_user_op(send_request.json()),
+        await client.send_user_op(send_request2.json()),
+    ]
+    path = tmp_path / "pool.snapshot"
+    await db.snapshot.export_pool(session, str(path))
+
+    for table in reversed(Base.metadata.sorted_tables):
+        await session.execute(delete(table))
+    await session.commit()
+
+    row_counts = await db.snapshot.import_pool(session, str(path))
+    await session.commit()
+
+    assert row_counts["user_ops"] == 2
+    assert row_counts["entry_points"] == 1
+    for user_op_hash in user_op_hashes:
+        user_op = await db.service.get_user_op_by_hash(session, user_op_hash)
+        assert user_op is not None
+        assert user_op.tx_hash is None
+
+    await client.send_user_op(
+        send_request.json(), expected_error_message="already in the pool"
+    )
+
+
+@pytest.mark.asyncio
+async def test_rejects_snapshot_with_other_columns(session, tmp_path):
+    path = tmp_path / "pool.snapshot"
+    with gzip.open(path, "wb") as f:
+        f.write(db.snapshot.MAGIC)
+        db.snapshot.write_chunk(f, b"entry_points")
+        db.snapshot.write_chunk(f, b"id")
+        db.snapshot.write_chunk(f, b"")
+
+    with pytest.raises(ValueError, match="do not match the database schema"):
+        await db.snapshot.import_pool(session, str(path))
+    await session.rollback()
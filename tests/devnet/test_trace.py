@@ -0,0 +1,45 @@
+import pytest
+
+from benchmarks.trace_generator import generate_trace
+from utils.trace import OPCODE_IDS, CompactTrace
+from utils.validation import read_memory
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"length": 500},
+        {"length": 500, "depth": 4, "calls": 10},
+        {"length": 500, "calls": 10, "prohibited_opcode_position": 321},
+    ],
+)
+def test_compact_trace_matches_step_by_step_scan(kwargs):
+    struct_logs = generate_trace(**kwargs)
+    trace = CompactTrace(struct_logs)
+
+    assert len(trace) == len(struct_logs)
+    assert trace.flagged_steps == [
+        i for i, step in enumerate(struct_logs) if step["op"] in OPCODE_IDS
+    ]
+    assert list(trace.depths) == [step["depth"] for step in struct_logs]
+    for i, step in enumerate(struct_logs):
+        assert trace.get_opcode(i) == (
+            step["op"] if step["op"] in OPCODE_IDS else None
+        )
+    assert trace.get_opcode(len(struct_logs)) is None
+
+
+@pytest.mark.parametrize(
+    "offset,size", [(0, 4), (30, 4), (60, 8), (64, 4), (100, 4), (0, 96)]
+)
+def test_reads_memory_like_a_flat_buffer(offset, size):
+    memory = ["11" * 32, "22" * 32]
+    expected = "".join(memory)[offset * 2 : (offset + size) * 2]
+
+    assert read_memory(memory, offset, size) == expected.ljust(size * 2, "0")
+
+
+def test_reads_zeros_past_the_end_of_memory():
+    assert read_memory(["ff" * 32], 30, 4) == "ffff0000"
+    assert read_memory(["ff" * 32], 62, 4) == "00000000"
+    assert read_memory([], 0, 4) == "00000000"
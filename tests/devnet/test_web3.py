@@ -0,0 +1,29 @@
+import brownie
+import pytest
+from web3 import Web3
+
+import utils.web3
+
+NOT_EXISTING_ADDRESS = "0x" + "12" * 20
+
+
+@pytest.mark.asyncio
+async def test_gets_bytecode_hashes(client, contracts):
+    addresses = [
+        contracts.entry_point.address,
+        brownie.accounts[0].address,
+        contracts.simple_account_factory.address,
+        NOT_EXISTING_ADDRESS,
+    ]
+
+    assert utils.web3.get_bytecode_hashes(addresses) == [
+        Web3.keccak(brownie.web3.eth.get_code(address)).hex()
+        for address in addresses
+    ]
+
+
+@pytest.mark.asyncio
+async def test_checks_address_is_contract(client, contracts):
+    assert utils.web3.is_contract(contracts.entry_point.address)
+    assert not utils.web3.is_contract(brownie.accounts[0].address)
+    assert not utils.web3.is_contract(NOT_EXISTING_ADDRESS)
@@ -5,6 +5,7 @@ import web3
 from brownie import network
 
 import app.constants as constants
+import utils.client
 import utils.deployments
 from tests.utils.common_classes import TestContracts
 
@@ -50,7 +51,9 @@ def send_request_with_paymaster_from_network_using_opcode(
             else test_paymaster.address
         )
 
-        send_request.user_op.sign(signer, contracts.entry_point)
+        utils.client.sign_user_op(
+            send_request.user_op, signer, contracts.entry_point
+        )
 
         return send_request
 
@@ -6,7 +6,7 @@ from brownie import web3
 from brownie.network.account import Account
 
 import utils.web3
-from utils.client import AppClient, SendRequest
+from utils.client import AppClient, SendRequest, sign_user_op
 from utils.user_op import UserOp, DEFAULTS_FOR_USER_OP
 
 
@@ -84,7 +84,7 @@ class TestSendRequest(SendRequest):
             user_op.max_priority_fee_per_gas + 2 * utils.web3.get_base_fee()
         )
         user_op.paymaster_and_data = web3.toBytes(hexstr=paymaster.address)
-        user_op.sign(account, entry_point)
+        sign_user_op(user_op, account, entry_point)
 
         self.user_op = user_op
 
@@ -0,0 +1,127 @@
+import asyncio
+import time
+from collections import defaultdict
+
+import eth_abi
+import httpx
+from eth_account import Account
+from web3 import Web3
+
+from utils.client import SendRequest, sign_user_op_hash
+from utils.user_op import DEFAULTS_FOR_USER_OP, UserOp
+
+GET_ADDRESS_SELECTOR = Web3.keccak(text="getAddress(address,uint256)")[:4]
+CREATE_ACCOUNT_SELECTOR = Web3.keccak(text="createAccount(address,uint256)")[:4]
+PERCENTILES = (50, 95, 99)
+
+
+def build_send_requests(
+    node_uri: str,
+    entry_point: str,
+    factory: str,
+    paymaster: str,
+    owner: Account,
+    count: int,
+    first_salt: int = 0,
+) -> list[SendRequest]:
+    w3 = Web3(Web3.HTTPProvider(node_uri))
+    chain_id = w3.eth.chain_id
+    latest_block = w3.eth.get_block("latest")
+    base_fee = latest_block.get("baseFeePerGas", 0)
+
+    send_requests = []
+    for salt in range(first_salt, first_salt + count):
+        account_args = eth_abi.encode(
+            ["address", "uint256"], [owner.address, salt]
+        )
+        sender = eth_abi.decode(
+            ["address"],
+            w3.eth.call(
+                {"to": factory, "data": GET_ADDRESS_SELECTOR + account_args}
+            ),
+        )[0]
+
+        user_op = UserOp(**DEFAULTS_FOR_USER_OP)
+        user_op.sender = Web3.toChecksumAddress(sender)
+        user_op.init_code = Web3.toBytes(hexstr=factory) + (
+            CREATE_ACCOUNT_SELECTOR + account_args
+        )
+        user_op.max_fee_per_gas = (
+            user_op.max_priority_fee_per_gas + 2 * base_fee
+        )
+        user_op.paymaster_and_data = Web3.toBytes(hexstr=paymaster)
+        sign_user_op_hash(
+            user_op,
+            owner,
+            Web3.toBytes(hexstr=user_op.get_hash(entry_point, chain_id)),
+        )
+        send_requests.append(SendRequest(entry_point, user_op))
+
+    return send_requests
+
+
+async def run(
+    host: str,
+    methods: list[str],
+    send_requests: list[SendRequest],
+    concurrency: int,
+    rate: float = 0,
+) -> dict[str, dict]:
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+
+    async with httpx.AsyncClient(
+        base_url=host, limits=limits, timeout=60
+    ) as client:
+
+        async def send(i: int, method: str, send_request: SendRequest):
+            if rate:
+                await asyncio.sleep(started_at + i / rate - time.monotonic())
+            async with semaphore:
+                request_started_at = time.monotonic()
+                try:
+                    response = await client.post(
+                        method, json=send_request.json()
+                    )
+                    failed = response.status_code != 200
+                except httpx.HTTPError:
+                    failed = True
+                latencies[method].append(time.monotonic() - request_started_at)
+                errors[method] += failed
+
+        async def send_all(i: int, send_request: SendRequest):
+            # The methods of a UserOp are called in order, e.g. its estimate
+            # has returned before it is sent
+            for j, method in enumerate(methods):
+                await send(i * len(methods) + j, method, send_request)
+
+        started_at = time.monotonic()
+        await asyncio.gather(
+            *(
+                send_all(i, send_request)
+                for i, send_request in enumerate(send_requests)
+            )
+        )
+        elapsed = time.monotonic() - started_at
+
+    return {
+        method: {
+            "requests": len(method_latencies),
+            "errors": errors[method],
+            "throughput": len(method_latencies) / elapsed,
+            **{
+                f"p{percentile}": get_percentile(method_latencies, percentile)
+                for percentile in PERCENTILES
+            },
+        }
+        for method, method_latencies in latencies.items()
+    }
+
+
+def get_percentile(values: list[float], percentile: int) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, len(values) * percentile // 100)]
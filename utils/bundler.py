@@ -0,0 +1,231 @@
+import asyncio
+import logging
+from typing import Optional
+
+import eth_abi
+import web3.constants
+from sqlalchemy.ext.asyncio import AsyncSession
+from web3 import Web3
+
+import app.constants as constants
+import db.service
+import utils.packing
+import utils.web3
+from app.config import settings
+from db.models import UserOp
+
+HANDLE_OPS_SELECTOR = Web3.keccak(
+    text=f"handleOps({constants.USER_OP_ABI_TYPE}[],address)"
+)[:4]
+HANDLE_AGGREGATED_OPS_SELECTOR = Web3.keccak(
+    text=f"handleAggregatedOps(({constants.USER_OP_ABI_TYPE}[],address,bytes)[]"
+    ",address)"
+)[:4]
+AGGREGATE_SIGNATURES_SELECTOR = Web3.keccak(
+    text=f"aggregateSignatures({constants.USER_OP_ABI_TYPE}[])"
+)[:4]
+MAX_BUNDLE_SIMULATIONS = 3
+
+logger = logging.getLogger(__name__)
+
+
+class Bundle:
+    def __init__(
+        self,
+        entry_point: str,
+        user_ops_per_aggregator: dict[Optional[str], list[UserOp]],
+        call_data: str,
+    ):
+        self.entry_point = entry_point
+        self.user_ops_per_aggregator = user_ops_per_aggregator
+        self.call_data = call_data
+
+    @property
+    def user_ops(self) -> list[UserOp]:
+        return [
+            user_op
+            for user_ops in self.user_ops_per_aggregator.values()
+            for user_op in user_ops
+        ]
+
+    def get_required_gas(self) -> int:
+        return sum(user_op.get_required_gas() for user_op in self.user_ops)
+
+
+async def build_bundles(
+    session: AsyncSession, beneficiary: str, gas_limit: int = None
+) -> list[Bundle]:
+    gas_limit = gas_limit or settings.bundle_gas_limit
+    base_fee = utils.web3.get_base_fee()
+    bundles = []
+    for entry_point in await db.service.get_supported_entry_points(session):
+        user_ops = await db.service.get_user_ops_for_bundle(
+            session, entry_point.address
+        )
+        bundle = await build_bundle(
+            entry_point.address,
+            utils.packing.pack_user_ops(user_ops, gas_limit, base_fee),
+            beneficiary,
+        )
+        if bundle:
+            bundles.append(bundle)
+
+    return bundles
+
+
+async def build_bundle(
+    entry_point_address: str, user_ops: list[UserOp], beneficiary: str
+) -> Optional[Bundle]:
+    # The UserOps failing on their own are found with one concurrent call
+    # each, the bundle is then only simulated again for the UserOps that
+    # fail together
+    user_ops = await get_user_ops_passing_simulation(
+        entry_point_address, user_ops, beneficiary
+    )
+    user_ops_per_aggregator = group_by_aggregator(user_ops)
+    for _ in range(MAX_BUNDLE_SIMULATIONS):
+        if not user_ops_per_aggregator:
+            return None
+
+        call_data, error = await asyncio.to_thread(
+            simulate_bundle,
+            entry_point_address,
+            user_ops_per_aggregator,
+            beneficiary,
+        )
+        if error is None:
+            return Bundle(
+                entry_point_address, user_ops_per_aggregator, call_data
+            )
+        if not error.get("data"):
+            logger.warning(f"The bundle simulation has failed: {error}")
+            return None
+
+        user_ops_per_aggregator = exclude_failed_user_ops(
+            user_ops_per_aggregator, error["data"]
+        )
+
+    return None
+
+
+async def get_user_ops_passing_simulation(
+    entry_point_address: str, user_ops: list[UserOp], beneficiary: str
+) -> list[UserOp]:
+    semaphore = asyncio.Semaphore(settings.bundle_simulation_concurrency)
+
+    async def passes(user_op: UserOp) -> bool:
+        async with semaphore:
+            _, error = await asyncio.to_thread(
+                simulate_bundle,
+                entry_point_address,
+                group_by_aggregator([user_op]),
+                beneficiary,
+            )
+            return error is None
+
+    results = await asyncio.gather(*(passes(user_op) for user_op in user_ops))
+    return [user_op for user_op, passed in zip(user_ops, results) if passed]
+
+
+def simulate_bundle(
+    entry_point_address: str,
+    user_ops_per_aggregator: dict[Optional[str], list[UserOp]],
+    beneficiary: str,
+) -> (str, Optional[dict]):
+    call_data = encode_bundle(user_ops_per_aggregator, beneficiary)
+    _, error = utils.web3.call(
+        from_=beneficiary, to=entry_point_address, data=call_data
+    )
+    return call_data, error
+
+
+def group_by_aggregator(
+    user_ops: list[UserOp],
+) -> dict[Optional[str], list[UserOp]]:
+    user_ops_per_aggregator = {}
+    for user_op in user_ops:
+        user_ops_per_aggregator.setdefault(user_op.aggregator, []).append(
+            user_op
+        )
+
+    return user_ops_per_aggregator
+
+
+def encode_bundle(
+    user_ops_per_aggregator: dict[Optional[str], list[UserOp]], beneficiary: str
+) -> str:
+    if list(user_ops_per_aggregator.keys()) == [None]:
+        encoded_args = eth_abi.encode(
+            [f"{constants.USER_OP_ABI_TYPE}[]", "address"],
+            [
+                [user_op.values() for user_op in user_ops_per_aggregator[None]],
+                beneficiary,
+            ],
+        )
+        return "0x" + (HANDLE_OPS_SELECTOR + encoded_args).hex()
+
+    ops_per_aggregator = []
+    for aggregator, user_ops in user_ops_per_aggregator.items():
+        values = [user_op.values() for user_op in user_ops]
+        ops_per_aggregator.append(
+            (
+                values,
+                aggregator or web3.constants.ADDRESS_ZERO,
+                aggregate_signatures(aggregator, values) if aggregator else b"",
+            )
+        )
+
+    encoded_args = eth_abi.encode(
+        [f"({constants.USER_OP_ABI_TYPE}[],address,bytes)[]", "address"],
+        [ops_per_aggregator, beneficiary],
+    )
+    return "0x" + (HANDLE_AGGREGATED_OPS_SELECTOR + encoded_args).hex()
+
+
+def aggregate_signatures(aggregator: str, user_ops_values: list[list]) -> bytes:
+    encoded_args = eth_abi.encode(
+        [f"{constants.USER_OP_ABI_TYPE}[]"], [user_ops_values]
+    )
+    result, _ = utils.web3.call(
+        from_=web3.constants.ADDRESS_ZERO,
+        to=aggregator,
+        data="0x" + (AGGREGATE_SIGNATURES_SELECTOR + encoded_args).hex(),
+    )
+    if result is None:
+        return b""
+
+    return eth_abi.decode(["bytes"], bytes.fromhex(result[2:]))[0]
+
+
+def exclude_failed_user_ops(
+    user_ops_per_aggregator: dict[Optional[str], list[UserOp]],
+    error_data: str,
+) -> dict[Optional[str], list[UserOp]]:
+    signature = error_data[2:10].lower()
+    if signature == constants.FAILED_OP_SIGNATURE:
+        op_index, _ = eth_abi.decode(
+            ["uint256", "string"], bytes.fromhex(error_data[10:])
+        )
+        for aggregator, user_ops in user_ops_per_aggregator.items():
+            if op_index < len(user_ops):
+                user_ops.pop(op_index)
+                break
+            op_index -= len(user_ops)
+        else:
+            return {}
+    elif signature == constants.SIGNATURE_VALIDATION_FAILED_SIGNATURE:
+        (aggregator,) = eth_abi.decode(
+            ["address"], bytes.fromhex(error_data[10:])
+        )
+        aggregator = Web3.toChecksumAddress(aggregator)
+        if aggregator not in user_ops_per_aggregator:
+            return {}
+        del user_ops_per_aggregator[aggregator]
+    else:
+        return {}
+
+    return {
+        aggregator: user_ops
+        for aggregator, user_ops in user_ops_per_aggregator.items()
+        if user_ops
+    }
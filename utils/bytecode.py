@@ -0,0 +1,130 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+from web3 import Web3
+
+import db.service
+import utils.web3
+from app.config import settings
+from db.base import async_session
+
+RESTRICTED_OPCODES = {
+    0x31: "BALANCE",
+    0x32: "ORIGIN",
+    0x3A: "GASPRICE",
+    0x3B: "EXTCODESIZE",
+    0x3C: "EXTCODECOPY",
+    0x3F: "EXTCODEHASH",
+    0x40: "BLOCKHASH",
+    0x41: "COINBASE",
+    0x42: "TIMESTAMP",
+    0x43: "NUMBER",
+    0x44: "DIFFICULTY",
+    0x45: "GASLIMIT",
+    0x47: "SELFBALANCE",
+    0x48: "BASEFEE",
+    0x5A: "GAS",
+    0xF0: "CREATE",
+    0xF1: "CALL",
+    0xF2: "CALLCODE",
+    0xF4: "DELEGATECALL",
+    0xF5: "CREATE2",
+    0xFA: "STATICCALL",
+    0xFF: "SELFDESTRUCT",
+}
+PUSH1 = 0x60
+PUSH32 = 0x7F
+
+logger = logging.getLogger(__name__)
+
+# Bytecodes never change, so an analysis is only dropped to bound the memory
+restricted_opcodes = OrderedDict()
+# Analyses not stored yet, written by the flusher off the request path
+pending_restricted_opcodes = {}
+
+
+def disassemble(bytecode: bytes) -> list[str]:
+    found = set()
+    i = 0
+    while i < len(bytecode):
+        opcode = bytecode[i]
+        if opcode in RESTRICTED_OPCODES:
+            found.add(RESTRICTED_OPCODES[opcode])
+        elif PUSH1 <= opcode <= PUSH32:
+            i += opcode - PUSH1 + 1
+        i += 1
+
+    return sorted(found)
+
+
+async def get_restricted_opcodes(
+    session, helper_contracts: list[tuple[str, str]]
+) -> dict[str, list[str]]:
+    bytecode_hashes = [bytecode_hash for _, bytecode_hash in helper_contracts]
+    missing_hashes = [
+        bytecode_hash
+        for bytecode_hash in bytecode_hashes
+        if lookup(bytecode_hash) is None
+    ]
+    if missing_hashes:
+        for bytecode_hash, opcodes in (
+            await db.service.get_restricted_opcodes(session, missing_hashes)
+        ).items():
+            remember(bytecode_hash, opcodes)
+
+    result = {}
+    for address, bytecode_hash in helper_contracts:
+        result[bytecode_hash] = lookup(bytecode_hash)
+        if result[bytecode_hash] is not None:
+            continue
+
+        bytecode = utils.web3.get_bytecode(address)
+        if Web3.keccak(bytecode).hex() != bytecode_hash:
+            # The code has changed since it was hashed, leave it to the trace
+            continue
+
+        result[bytecode_hash] = disassemble(bytecode)
+        remember(bytecode_hash, result[bytecode_hash])
+        pending_restricted_opcodes[bytecode_hash] = result[bytecode_hash]
+
+    return result
+
+
+def lookup(bytecode_hash: str) -> Optional[list[str]]:
+    if bytecode_hash in restricted_opcodes:
+        restricted_opcodes.move_to_end(bytecode_hash)
+        return restricted_opcodes[bytecode_hash]
+    return pending_restricted_opcodes.get(bytecode_hash)
+
+
+def remember(bytecode_hash: str, opcodes: list[str]):
+    restricted_opcodes[bytecode_hash] = opcodes
+    restricted_opcodes.move_to_end(bytecode_hash)
+    while len(restricted_opcodes) > settings.restricted_opcodes_cache_size:
+        restricted_opcodes.popitem(last=False)
+
+
+async def flush(session):
+    global pending_restricted_opcodes
+    if not pending_restricted_opcodes:
+        return
+
+    pending, pending_restricted_opcodes = pending_restricted_opcodes, {}
+    try:
+        await db.service.set_restricted_opcodes(session, pending)
+    except Exception:
+        pending_restricted_opcodes.update(pending)
+        raise
+
+
+async def run_flusher():
+    while True:
+        await asyncio.sleep(settings.restricted_opcodes_flush_interval)
+        try:
+            async with async_session() as session:
+                await flush(session)
+                await session.commit()
+        except Exception:
+            logger.exception("Failed to store the restricted opcodes")
@@ -1,5 +1,7 @@
 from urllib.parse import urlparse, urlunparse
 
+from eth_account import Account
+from eth_account.messages import encode_defunct
 from httpx import AsyncClient
 
 from utils.user_op import UserOp
@@ -67,6 +69,18 @@ class SendRequest:
             return "0x" + bytes.hex(v)
 
 
+def sign_user_op(user_op: UserOp, owner: Account, entry_point) -> None:
+    sign_user_op_hash(
+        user_op, owner, entry_point.getUserOpHash(user_op.values())
+    )
+
+
+def sign_user_op_hash(user_op: UserOp, owner: Account, user_op_hash) -> None:
+    user_op.signature = owner.sign_message(
+        encode_defunct(user_op_hash)
+    ).signature
+
+
 def get_rpc_uri(uri: str, port: int = 8545) -> str:
     parsed = urlparse(uri)
     if not parsed.scheme or not parsed.netloc:
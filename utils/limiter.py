@@ -0,0 +1,134 @@
+import asyncio
+import contextvars
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+import utils.metrics
+from app.config import settings
+
+# Fully trusted UserOps and estimates need a plain eth_call, the rest a
+# debug_traceCall, and each lane gets its own budget so slow traces do not
+# queue ahead of the cheap calls
+CALL = "call"
+TRACE = "trace"
+
+simulation_limiters = {}
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        max_limit: int,
+        max_queue_size: int,
+        target_latency: float,
+        name: str,
+    ):
+        self.max_limit = max_limit
+        self.max_queue_size = max_queue_size
+        self.target_latency = target_latency
+        self.name = name
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.waiters = deque()
+        self.decreased_at = 0.0
+        # Sized to the limit, so an admitted call never waits for a thread
+        # and the calls of one limiter can not hold up the others
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_limit, thread_name_prefix=f"{name}-limiter"
+        )
+
+    async def run(self, f, *args, **kwargs):
+        if self.in_flight < int(self.limit) and not self.waiters:
+            self.in_flight += 1
+        else:
+            await self._wait()
+
+        latency = None
+
+        def call():
+            nonlocal latency
+            started_at = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                latency = time.perf_counter() - started_at
+
+        def finish(_):
+            if latency is not None:
+                self._update_limit(latency)
+            self._release()
+
+        future = asyncio.get_running_loop().run_in_executor(
+            self.executor, contextvars.copy_context().run, call
+        )
+        # The slot is held until the thread is done, even if the caller
+        # goes away first
+        future.add_done_callback(finish)
+        return await asyncio.shield(future)
+
+    async def _wait(self):
+        if len(self.waiters) >= self.max_queue_size:
+            raise HTTPException(
+                status_code=503,
+                detail="The node is overloaded, retry later.",
+                headers={"Retry-After": "1"},
+            )
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self._set_metrics()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just before the cancellation
+                self._release()
+            else:
+                self.waiters.remove(waiter)
+            raise
+        finally:
+            self._set_metrics()
+
+    def _update_limit(self, latency: float):
+        # AIMD: grow by one slot per window of fast calls, halve on a slow one
+        # but at most once per latency period, so a burst of slow calls that
+        # started together counts as one congestion signal
+        now = time.monotonic()
+        if latency <= self.target_latency:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        elif now - self.decreased_at > latency:
+            self.limit = max(1.0, self.limit / 2)
+            self.decreased_at = now
+        self._set_metrics()
+
+    def _release(self):
+        self.in_flight -= 1
+        while self.waiters and self.in_flight < int(self.limit):
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _set_metrics(self):
+        utils.metrics.QUEUE_DEPTH.labels(self.name).set(len(self.waiters))
+        utils.metrics.CONCURRENCY_LIMIT.labels(self.name).set(int(self.limit))
+
+
+def get_simulation_limiter(lane: str) -> AdaptiveLimiter:
+    if lane not in simulation_limiters:
+        if lane == TRACE:
+            max_limit = settings.simulation_concurrency
+            max_queue_size = settings.simulation_queue_size
+        else:
+            max_limit = settings.call_simulation_concurrency
+            max_queue_size = settings.call_simulation_queue_size
+        simulation_limiters[lane] = AdaptiveLimiter(
+            max_limit,
+            max_queue_size,
+            settings.simulation_target_latency,
+            name=lane,
+        )
+    return simulation_limiters[lane]
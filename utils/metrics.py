@@ -0,0 +1,156 @@
+import asyncio
+import contextlib
+import contextvars
+import logging
+import os
+import re
+import time
+
+from fastapi import HTTPException
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+
+import db.service
+import utils.request_stats
+from app.config import settings
+from db.base import async_session, engine
+
+OK = "ok"
+REJECTED = "rejected"
+ERROR = "error"
+
+method = contextvars.ContextVar("method", default="")
+logger = logging.getLogger(__name__)
+
+STAGE_DURATION = Histogram(
+    "mempool_stage_duration_seconds",
+    "Duration of a request handling stage",
+    ["method", "stage", "outcome"],
+    buckets=(
+        0.0005,
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1,
+        2.5,
+        5,
+    ),
+)
+TRACE_STEPS = Histogram(
+    "mempool_trace_steps",
+    "Number of steps in a simulateValidation trace",
+    ["method"],
+    buckets=(100, 1_000, 5_000, 10_000, 25_000, 50_000, 100_000, 250_000),
+)
+REJECTIONS = Counter(
+    "mempool_rejections",
+    "Rejected requests by reason",
+    ["method", "reason"],
+)
+POOL_SIZE = Gauge(
+    "mempool_pool_size",
+    "Number of pending UserOps",
+    ["trusted"],
+    multiprocess_mode="mostrecent",
+)
+
+QUEUE_DEPTH = Gauge(
+    "mempool_queue_depth",
+    "Number of requests waiting for a concurrency limiter slot",
+    ["limiter"],
+    multiprocess_mode="livesum",
+)
+CONCURRENCY_LIMIT = Gauge(
+    "mempool_concurrency_limit",
+    "Current adaptive limit of in-flight node calls",
+    ["limiter"],
+    multiprocess_mode="livesum",
+)
+
+
+@contextlib.contextmanager
+def measure(stage: str):
+    outcome = OK
+    started_at = time.perf_counter()
+    try:
+        yield
+    except HTTPException:
+        outcome = REJECTED
+        raise
+    except Exception:
+        outcome = ERROR
+        raise
+    finally:
+        STAGE_DURATION.labels(method.get(), stage, outcome).observe(
+            time.perf_counter() - started_at
+        )
+
+
+def observe_trace(trace: list[dict]):
+    TRACE_STEPS.labels(method.get()).observe(len(trace))
+
+
+def count_rejection(detail: str):
+    # Drop the variable parts (addresses, hashes, revert data) so the reason
+    # stays a bounded set of message templates
+    reason = re.sub(r"0x[0-9a-fA-F]*", "0x", str(detail).split(":")[0])
+    REJECTIONS.labels(method.get(), reason).inc()
+
+
+def get_query_stage(statement: str) -> str:
+    return "db_" + statement.lstrip().split(None, 1)[0].lower()
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def start_query_timer(conn, cursor, statement, parameters, context, many):
+    conn.info["query_started_at"] = time.perf_counter()
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def stop_query_timer(conn, cursor, statement, parameters, context, many):
+    started_at = conn.info.pop("query_started_at", None)
+    if started_at is None:
+        return
+    duration = time.perf_counter() - started_at
+    STAGE_DURATION.labels(method.get(), get_query_stage(statement), OK).observe(
+        duration
+    )
+    utils.request_stats.record_query(duration)
+
+
+def generate() -> bytes:
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return generate_latest(REGISTRY)
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+async def run_pool_size_updater():
+    while True:
+        try:
+            async with async_session() as session:
+                pool_sizes = await db.service.count_user_ops_by_trust(session)
+            for is_trusted in (False, True):
+                POOL_SIZE.labels(str(is_trusted).lower()).set(
+                    pool_sizes.get(is_trusted, 0)
+                )
+        except Exception:
+            logger.exception("Failed to update the pool size metrics")
+
+        await asyncio.sleep(settings.metrics_pool_size_interval)
@@ -0,0 +1,59 @@
+def pack_user_ops(user_ops: list, gas_limit: int, base_fee: int) -> list:
+    candidates = []
+    for i, user_op in enumerate(user_ops):
+        priority_fee = get_priority_fee_per_gas(user_op, base_fee)
+        if priority_fee > 0:
+            candidates.append((-priority_fee, user_op.get_required_gas(), i))
+    candidates.sort()
+
+    return fill_bundle(
+        [(candidate[1], user_ops[candidate[2]]) for candidate in candidates],
+        gas_limit,
+    )
+
+
+def fill_bundle(candidates: list[tuple], gas_limit: int) -> list:
+    if not candidates:
+        return []
+
+    min_required_gas = min(candidate[0] for candidate in candidates)
+    selected_user_ops = []
+    senders = set()
+    untrusted_bytecode_hashes = set()
+    for required_gas, user_op in candidates:
+        if gas_limit < min_required_gas:
+            break
+        if required_gas > gas_limit or user_op.sender in senders:
+            continue
+
+        bytecode_hashes = get_untrusted_bytecode_hashes(user_op)
+        if not untrusted_bytecode_hashes.isdisjoint(bytecode_hashes):
+            continue
+
+        selected_user_ops.append(user_op)
+        gas_limit -= required_gas
+        senders.add(user_op.sender)
+        untrusted_bytecode_hashes.update(bytecode_hashes)
+
+    return selected_user_ops
+
+
+def get_priority_fee_per_gas(user_op, base_fee: int) -> int:
+    return min(
+        user_op.max_priority_fee_per_gas, user_op.max_fee_per_gas - base_fee
+    )
+
+
+def get_revenue(user_ops: list, base_fee: int) -> int:
+    return sum(
+        get_priority_fee_per_gas(user_op, base_fee) * user_op.get_required_gas()
+        for user_op in user_ops
+    )
+
+
+def get_untrusted_bytecode_hashes(user_op) -> list[str]:
+    return [
+        bytecode.hash
+        for bytecode in user_op.bytecodes
+        if not bytecode.is_trusted
+    ]
@@ -0,0 +1,117 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import time
+from typing import Optional
+
+from fastapi import HTTPException
+
+from app.config import settings
+
+BUCKET = struct.Struct("dd")  # tokens, updated at
+SECRET_SIZE = 32
+
+token_buckets = None
+
+
+class TokenBuckets:
+    def __init__(self, slots: int, path: str = ""):
+        self.slots = slots
+        # The buckets follow a random secret that keys the slot hash, so the
+        # slot of a paymaster or factory can not be drained by grinding
+        # senders that collide with it
+        size = SECRET_SIZE + slots * BUCKET.size
+        if path:
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(self._fd).st_size < size:
+                    os.ftruncate(self._fd, size)
+                self._buffer = mmap.mmap(self._fd, size)
+                if not any(self._buffer[:SECRET_SIZE]):
+                    self._buffer[:SECRET_SIZE] = os.urandom(SECRET_SIZE)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            self._fd = None
+            self._buffer = bytearray(size)
+            self._buffer[:SECRET_SIZE] = os.urandom(SECRET_SIZE)
+        self._secret = bytes(self._buffer[:SECRET_SIZE])
+
+    def get_slot(self, key: str) -> int:
+        digest = hashlib.blake2b(
+            key.encode(), key=self._secret, digest_size=8
+        ).digest()
+        return int.from_bytes(digest, "big") % self.slots
+
+    def consume(self, key: str, rate: float, burst: int) -> bool:
+        offset = SECRET_SIZE + self.get_slot(key) * BUCKET.size
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            tokens, updated_at = BUCKET.unpack_from(self._buffer, offset)
+            now = time.time()
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            BUCKET.pack_into(self._buffer, offset, tokens, now)
+        finally:
+            if self._fd is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+        return allowed
+
+
+def get_token_buckets() -> TokenBuckets:
+    global token_buckets
+    if token_buckets is None:
+        token_buckets = TokenBuckets(
+            settings.rate_limit_slots, settings.rate_limit_shared_file
+        )
+    return token_buckets
+
+
+def check_user_op(user_op, client_ip: Optional[str]):
+    limits = (
+        (
+            "client IP",
+            client_ip,
+            settings.rate_limit_client_ip,
+            settings.rate_limit_client_ip_burst,
+        ),
+        (
+            "sender",
+            user_op.sender.lower(),
+            settings.rate_limit_sender,
+            settings.rate_limit_sender_burst,
+        ),
+        (
+            "paymaster",
+            get_address_from_first_20_bytes(user_op.paymaster_and_data),
+            settings.rate_limit_paymaster,
+            settings.rate_limit_paymaster_burst,
+        ),
+        (
+            "factory",
+            get_address_from_first_20_bytes(user_op.init_code),
+            settings.rate_limit_factory,
+            settings.rate_limit_factory_burst,
+        ),
+    )
+    for kind, key, rate, burst in limits:
+        if not (rate and key):
+            continue
+
+        if not get_token_buckets().consume(f"{kind}:{key}", rate, burst):
+            raise HTTPException(
+                status_code=429,
+                detail=f"Too many requests for the {kind} {key}.",
+            )
+
+
+def get_address_from_first_20_bytes(data: Optional[bytes]) -> Optional[str]:
+    if data and len(data) >= 20:
+        return "0x" + data[:20].hex()
@@ -0,0 +1,91 @@
+import asyncio
+import datetime
+import logging
+from collections import defaultdict
+
+from web3 import Web3
+
+import db.service
+import utils.web3
+from app.config import settings
+from db.base import async_session
+
+OK = "ok"
+THROTTLED = "throttled"
+BANNED = "banned"
+
+logger = logging.getLogger(__name__)
+
+
+class ReputationTracker:
+    def __init__(self):
+        self._totals: dict[str, list[int]] = {}
+        self._deltas: dict[str, list[int]] = defaultdict(lambda: [0, 0])
+
+    def seen(self, helper_contracts: list[tuple[str, str]]):
+        for address, bytecode_hash in helper_contracts:
+            self._deltas[address][0] += 1
+            self._deltas[bytecode_hash][0] += 1
+
+    def included(self, entities: list[str]):
+        for entity in entities:
+            self._deltas[entity][1] += 1
+
+    def get_status(self, entity: str) -> str:
+        ops_seen, ops_included = self._totals.get(entity, (0, 0))
+        if entity in self._deltas:
+            ops_seen += self._deltas[entity][0]
+            ops_included += self._deltas[entity][1]
+
+        max_seen = (
+            ops_seen // settings.reputation_min_inclusion_rate_denominator
+        )
+        if max_seen <= ops_included + settings.reputation_throttling_slack:
+            return OK
+        if max_seen <= ops_included + settings.reputation_ban_slack:
+            return THROTTLED
+        return BANNED
+
+    async def flush(self, session):
+        deltas, self._deltas = self._deltas, defaultdict(lambda: [0, 0])
+        try:
+            await db.service.add_reputation_deltas(session, deltas)
+        except Exception:
+            for entity, (ops_seen, ops_included) in deltas.items():
+                self._deltas[entity][0] += ops_seen
+                self._deltas[entity][1] += ops_included
+            raise
+
+        await db.service.decay_reputations(
+            session,
+            datetime.timedelta(seconds=settings.reputation_decay_interval),
+        )
+        self._totals = await db.service.get_reputations(
+            session,
+            min_ops_seen=settings.reputation_min_inclusion_rate_denominator
+            * settings.reputation_throttling_slack,
+        )
+
+
+tracker = ReputationTracker()
+
+
+def get_user_op_entities(user_op) -> list[str]:
+    entities = [Web3.toChecksumAddress(user_op.sender)]
+    for data in (user_op.init_code, user_op.paymaster_and_data):
+        address = data and utils.web3.get_address_from_first_20_bytes(data)
+        if address:
+            entities.append(address)
+
+    return entities
+
+
+async def run_flusher():
+    while True:
+        await asyncio.sleep(settings.reputation_flush_interval)
+        try:
+            async with async_session() as session:
+                await tracker.flush(session)
+                await session.commit()
+        except Exception:
+            logger.exception("Failed to flush the reputation counters")
@@ -0,0 +1,67 @@
+import contextvars
+import json
+import logging
+import time
+from collections import Counter
+from typing import Optional
+
+DEBUG_HEADER = "X-Mempool-Debug"
+TIMING_HEADER = "X-Mempool-Timing"
+
+current = contextvars.ContextVar("request_stats", default=None)
+logger = logging.getLogger(__name__)
+
+
+class RequestStats:
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.rpc_calls = Counter()
+        self.rpc_time = 0.0
+        self.db_queries = 0
+        self.db_time = 0.0
+
+    def get_total_time(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def get_timing_header(self) -> str:
+        return (
+            f"rpc;count={sum(self.rpc_calls.values())};"
+            f"dur={self.rpc_time * 1000:.1f}, "
+            f"db;count={self.db_queries};dur={self.db_time * 1000:.1f}, "
+            f"total;dur={self.get_total_time() * 1000:.1f}"
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "rpc_calls": dict(self.rpc_calls),
+            "rpc_ms": round(self.rpc_time * 1000, 1),
+            "db_queries": self.db_queries,
+            "db_ms": round(self.db_time * 1000, 1),
+            "total_ms": round(self.get_total_time() * 1000, 1),
+        }
+
+
+def start() -> RequestStats:
+    stats = RequestStats()
+    current.set(stats)
+    return stats
+
+
+def record_rpc(method: str, duration: float):
+    stats: Optional[RequestStats] = current.get()
+    if stats is not None:
+        stats.rpc_calls[method] += 1
+        stats.rpc_time += duration
+
+
+def record_query(duration: float):
+    stats: Optional[RequestStats] = current.get()
+    if stats is not None:
+        stats.db_queries += 1
+        stats.db_time += duration
+
+
+def log(path: str, status_code: int, stats: RequestStats):
+    logger.info(
+        json.dumps({"path": path, "status": status_code, **stats.to_dict()})
+    )
@@ -0,0 +1,98 @@
+import asyncio
+import datetime
+import logging
+
+from fastapi import HTTPException
+
+import db.service
+import utils.web3
+from app.config import settings
+from db.base import async_session
+from utils.validation import SimulationResult
+
+ADVISORY_LOCK_KEY = 4337
+CHECKPOINT = "revalidation"
+
+logger = logging.getLogger(__name__)
+
+
+async def revalidate_user_ops(
+    session, from_block: int, to_block: int
+) -> list[int]:
+    (addresses, receipts), from_timestamp, to_timestamp = await asyncio.gather(
+        asyncio.to_thread(utils.web3.get_logs, from_block, to_block),
+        asyncio.to_thread(utils.web3.get_block_timestamp, from_block - 1),
+        asyncio.to_thread(utils.web3.get_block_timestamp, to_block),
+    )
+    # The included UserOps would fail the simulation on their used nonces,
+    # they are marked as included instead and not revalidated
+    await db.service.set_user_op_receipts(session, receipts)
+    user_ops = await db.service.get_user_ops_to_revalidate(
+        session,
+        addresses,
+        datetime.datetime.fromtimestamp(from_timestamp),
+        datetime.datetime.fromtimestamp(to_timestamp),
+    )
+
+    semaphore = asyncio.Semaphore(settings.revalidation_concurrency)
+
+    async def is_valid(user_op) -> bool:
+        async with semaphore:
+            return await asyncio.to_thread(simulate, user_op)
+
+    results = await asyncio.gather(*(is_valid(user_op) for user_op in user_ops))
+    invalid_user_op_ids = [
+        user_op.id for user_op, valid in zip(user_ops, results) if not valid
+    ]
+    if invalid_user_op_ids:
+        await db.service.delete_user_ops(session, invalid_user_op_ids)
+
+    return invalid_user_op_ids
+
+
+def simulate(user_op) -> bool:
+    entry_point = utils.web3.EntryPoint(user_op.entry_point)
+    try:
+        simulation_result = SimulationResult(
+            *utils.web3.call_simulate_validation(
+                user_op, entry_point, trace=False
+            )
+        )
+        simulation_result.validate()
+    except HTTPException:
+        return False
+
+    return not simulation_result.sig_failed
+
+
+async def revalidate_new_blocks(session, block_number: int) -> bool:
+    # The last revalidated block is read and moved under the lock and
+    # committed with the deletions, so no range is skipped when the workers
+    # take turns holding the lock
+    if not await db.service.try_advisory_lock(session, ADVISORY_LOCK_KEY):
+        return False
+
+    last_block = await db.service.get_checkpoint(session, CHECKPOINT)
+    if last_block is not None and block_number <= last_block:
+        return False
+
+    if last_block is not None:
+        from_block = max(
+            last_block + 1, block_number - settings.revalidation_max_blocks
+        )
+        await revalidate_user_ops(session, from_block, block_number)
+
+    await db.service.set_checkpoint(session, CHECKPOINT, block_number)
+    await session.commit()
+    return True
+
+
+async def run_revalidator():
+    while True:
+        await asyncio.sleep(settings.revalidation_poll_interval)
+        try:
+            block_number = await asyncio.to_thread(utils.web3.get_block_number)
+            async with async_session() as session:
+                await revalidate_new_blocks(session, block_number)
+        except Exception:
+            logger.exception("Failed to revalidate the pool")
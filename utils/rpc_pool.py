@@ -0,0 +1,232 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Optional
+
+from web3 import HTTPProvider
+from web3.providers.base import JSONBaseProvider
+
+import utils.request_stats
+from app.config import settings
+
+METHOD_NOT_FOUND = -32601
+HEDGED_METHODS = {
+    "eth_blockNumber",
+    "eth_call",
+    "eth_chainId",
+    "eth_estimateGas",
+    "eth_getBlockByNumber",
+    "eth_getCode",
+    "eth_getLogs",
+    "eth_getTransactionByHash",
+    "eth_getTransactionReceipt",
+}
+MIN_LATENCY_SAMPLES = 20
+
+logger = logging.getLogger(__name__)
+
+
+class InstrumentedHTTPProvider(HTTPProvider):
+    def make_request(self, method: str, params) -> dict:
+        started_at = time.perf_counter()
+        try:
+            return super().make_request(method, params)
+        finally:
+            utils.request_stats.record_rpc(
+                method, time.perf_counter() - started_at
+            )
+
+
+class Endpoint:
+    def __init__(self, uri: str, weight: float):
+        self.uri = uri
+        self.weight = weight
+        self.provider = HTTPProvider(uri)
+        self.in_flight = 0
+        self.healthy = True
+        self.block_number = 0
+        self.latencies = deque(maxlen=200)
+        self.unsupported_methods = set()
+        self._lock = threading.Lock()
+
+    def make_request(self, method: str, params) -> dict:
+        with self._lock:
+            self.in_flight += 1
+        started_at = time.monotonic()
+        try:
+            response = self.provider.make_request(method, params)
+        except Exception:
+            self.healthy = False
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+        self.latencies.append(time.monotonic() - started_at)
+        return response
+
+    def get_load(self) -> float:
+        return (self.in_flight + 1) / self.weight
+
+    def get_p95_latency(self) -> Optional[float]:
+        if len(self.latencies) < MIN_LATENCY_SAMPLES:
+            return None
+        return sorted(self.latencies)[int(len(self.latencies) * 0.95)]
+
+
+class PooledHTTPProvider(JSONBaseProvider):
+    def __init__(
+        self,
+        endpoints: dict[str, float],
+        health_check_interval: float = 5,
+        max_block_lag: int = 3,
+        hedge_requests: bool = False,
+    ):
+        super().__init__()
+        self.endpoints = [
+            Endpoint(uri, weight) for uri, weight in endpoints.items()
+        ]
+        self.health_check_interval = health_check_interval
+        self.max_block_lag = max_block_lag
+        self.hedge_requests = hedge_requests
+        self._health_checker = None
+        self._lock = threading.Lock()
+
+    def isConnected(self) -> bool:
+        return any(endpoint.healthy for endpoint in self.endpoints)
+
+    def make_request(self, method: str, params) -> dict:
+        started_at = time.perf_counter()
+        try:
+            return self._route_request(method, params)
+        finally:
+            utils.request_stats.record_rpc(
+                method, time.perf_counter() - started_at
+            )
+
+    def _route_request(self, method: str, params) -> dict:
+        self._start_health_checker()
+
+        endpoints = self.get_endpoints(method)
+        if (
+            self.hedge_requests
+            and method in HEDGED_METHODS
+            and len(endpoints) > 1
+        ):
+            return self._make_hedged_request(endpoints, method, params)
+
+        return self._make_request(endpoints, method, params)
+
+    def get_endpoints(self, method: str) -> list[Endpoint]:
+        endpoints = [
+            endpoint
+            for endpoint in self.endpoints
+            if method not in endpoint.unsupported_methods
+        ] or self.endpoints
+        return sorted(
+            endpoints,
+            key=lambda endpoint: (not endpoint.healthy, endpoint.get_load()),
+        )
+
+    def _make_request(self, endpoints: list[Endpoint], method: str, params):
+        for i, endpoint in enumerate(endpoints):
+            is_last = i == len(endpoints) - 1
+            try:
+                response = endpoint.make_request(method, params)
+            except Exception:
+                if is_last:
+                    raise
+                logger.warning(f"RPC endpoint {endpoint.uri} has failed")
+                continue
+
+            error = response.get("error")
+            if error and error.get("code") == METHOD_NOT_FOUND:
+                endpoint.unsupported_methods.add(method)
+                if not is_last:
+                    continue
+
+            return response
+
+    def _make_hedged_request(
+        self, endpoints: list[Endpoint], method: str, params
+    ):
+        # Each request gets its own thread, a shared pool would cap the RPC
+        # concurrency of the whole worker below the simulation limits
+        primary = run_in_thread(self._make_request, endpoints, method, params)
+        done, _ = wait([primary], timeout=endpoints[0].get_p95_latency())
+        if done:
+            return primary.result()
+
+        hedged = run_in_thread(
+            self._make_request, endpoints[1:] + endpoints[:1], method, params
+        )
+        pending = {primary, hedged}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+
+        # Both have failed
+        return primary.result()
+
+    def _start_health_checker(self):
+        if self._health_checker is not None:
+            return
+        with self._lock:
+            if self._health_checker is None:
+                self._health_checker = threading.Thread(
+                    target=self._check_health, daemon=True
+                )
+                self._health_checker.start()
+
+    def _check_health(self):
+        while True:
+            for endpoint in self.endpoints:
+                try:
+                    response = endpoint.provider.make_request(
+                        "eth_blockNumber", []
+                    )
+                    endpoint.block_number = int(response["result"], 16)
+                    endpoint.healthy = True
+                except Exception:
+                    endpoint.healthy = False
+
+            max_block_number = max(
+                endpoint.block_number for endpoint in self.endpoints
+            )
+            for endpoint in self.endpoints:
+                if (
+                    max_block_number - endpoint.block_number
+                    > self.max_block_lag
+                ):
+                    endpoint.healthy = False
+
+            time.sleep(self.health_check_interval)
+
+
+def run_in_thread(f, *args) -> Future:
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(f(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+def get_provider():
+    if not settings.rpc_endpoints:
+        return InstrumentedHTTPProvider(settings.rpc_endpoint_uri)
+
+    return PooledHTTPProvider(
+        settings.rpc_endpoints,
+        health_check_interval=settings.rpc_health_check_interval,
+        max_block_lag=settings.rpc_max_block_lag,
+        hedge_requests=settings.rpc_hedge_requests,
+    )
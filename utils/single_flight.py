@@ -0,0 +1,38 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable
+
+calls = {}
+
+
+async def run(key: Hashable, f: Callable[..., Awaitable], *args, **kwargs):
+    while (future := calls.get(key)) is not None:
+        try:
+            # Shielded, so a waiter that goes away does not cancel the others
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                raise
+            # The leader was cancelled, e.g. its client has disconnected, so
+            # one of the waiters takes over the work
+
+    future = calls[key] = asyncio.get_running_loop().create_future()
+    try:
+        result = await f(*args, **kwargs)
+    except Exception as e:
+        future.set_exception(e)
+        # Marks the exception as retrieved when nobody else was waiting
+        future.exception()
+        raise
+    except BaseException:
+        future.cancel()
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        if calls.get(key) is future:
+            del calls[key]
+
+
+def get_user_op_key(method: str, user_op, entry_point: str) -> tuple:
+    return method, entry_point, tuple(user_op.values())
@@ -0,0 +1,71 @@
+import re
+from array import array
+from itertools import repeat
+from operator import itemgetter
+from typing import Optional
+
+PROHIBITED_OPCODES = (
+    "BALANCE",
+    "BASEFEE",
+    "BLOCKHASH",
+    "COINBASE",
+    "CREATE",
+    "DIFFICULTY",
+    "GASLIMIT",
+    "GASPRICE",
+    "NUMBER",
+    "ORIGIN",
+    "PREVRANDAO",
+    "SELFBALANCE",
+    "SELFDESTRUCT",
+    "TIMESTAMP",
+)
+CALL_OPCODES = ("CALL", "CALLCODE", "DELEGATECALL", "STATICCALL")
+EXTCODE_OPCODES = ("EXTCODEHASH", "EXTCODESIZE", "EXTCODECOPY")
+
+# Opcodes the validation looks at get ids 1..255, all the others are 0
+OPCODES = (None,) + tuple(
+    dict.fromkeys(
+        PROHIBITED_OPCODES + CALL_OPCODES + EXTCODE_OPCODES + ("CREATE2", "GAS")
+    )
+)
+OPCODE_IDS = {opcode: i for i, opcode in enumerate(OPCODES) if i}
+STEPS_WITH_OPERANDS = {
+    OPCODE_IDS[opcode] for opcode in CALL_OPCODES + EXTCODE_OPCODES
+}
+FLAGGED_STEP = re.compile(rb"[^\x00]")
+
+get_opcode = itemgetter("op")
+get_depth = itemgetter("depth")
+
+
+class CompactTrace:
+    def __init__(self, struct_logs: list[dict]):
+        self.opcode_ids = bytes(
+            map(OPCODE_IDS.get, map(get_opcode, struct_logs), repeat(0))
+        )
+        self.depths = array("H", map(get_depth, struct_logs))
+        self.flagged_steps = [
+            match.start() for match in FLAGGED_STEP.finditer(self.opcode_ids)
+        ]
+        # Stack and memory are only needed to resolve the operands of calls
+        # and code accesses, the rest of the trace can be freed
+        self.steps = {
+            i: struct_logs[i]
+            for i in self.flagged_steps
+            if self.opcode_ids[i] in STEPS_WITH_OPERANDS
+        }
+
+    def __len__(self) -> int:
+        return len(self.opcode_ids)
+
+    def get_opcode(self, i: int) -> Optional[str]:
+        if i >= len(self.opcode_ids):
+            return None
+        return OPCODES[self.opcode_ids[i]]
+
+    def get_stack(self, i: int) -> list[str]:
+        return self.steps[i]["stack"]
+
+    def get_memory(self, i: int) -> list[str]:
+        return self.steps[i].get("memory") or []
@@ -1,12 +1,11 @@
 from typing import Optional
 
-import brownie
 import eth_abi
 import web3.eth
-from eth_account.messages import encode_defunct
 from pydantic import BaseModel, Extra
-from web3 import Account, Web3
+from web3 import Web3
 
+import app.constants as constants
 from app.config import settings
 
 DEFAULTS_FOR_USER_OP = {
@@ -59,12 +58,35 @@ class UserOp(BaseModel):
             * 1_000_000_000
         )
 
+    def get_replaceable_fees(self, fee_bump: int) -> (int, int):
+        return (
+            self.max_fee_per_gas * 100 // (100 + fee_bump),
+            self.max_priority_fee_per_gas * 100 // (100 + fee_bump),
+        )
+
     def fill_hash(self, entry_point: web3.eth.Contract) -> None:
         self.hash = (
             "0x"
             + entry_point.functions.getUserOpHash(self.values()).call().hex()
         )
 
+    def get_hash(self, entry_point_address: str, chain_id: int) -> str:
+        encoded = eth_abi.encode([constants.USER_OP_ABI_TYPE], [self.values()])
+        # Same bytes as UserOperationLib.pack: the struct encoding up to the
+        # tail of the signature
+        struct = encoded[32:]
+        signature_offset = int.from_bytes(struct[320:352], byteorder="big")
+        return Web3.keccak(
+            eth_abi.encode(
+                ["bytes32", "address", "uint256"],
+                [
+                    Web3.keccak(struct[:signature_offset]),
+                    entry_point_address,
+                    chain_id,
+                ],
+            )
+        ).hex()
+
     def encode(self, with_signature=True) -> bytes:
         types = [
             "address",  # sender
@@ -97,12 +119,6 @@ class UserOp(BaseModel):
 
         return eth_abi.encode(types, values)
 
-    def sign(self, owner: Account, entry_point: brownie.Contract):
-        s = owner.sign_message(
-            encode_defunct(entry_point.getUserOpHash(self.values()))
-        )
-        self.signature = s.signature
-
     def values(self) -> list:
         return [
             self.sender,
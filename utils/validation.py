@@ -2,33 +2,47 @@ import re
 import time
 from typing import Optional
 
-import eth_abi
 import hexbytes
 import web3.constants
+from eth_abi.decoding import ContextFramesBytesIO
+from eth_abi.registry import registry
 from fastapi import HTTPException
+from web3 import Web3
 from web3.eth import Contract
 
 import app.constants as constants
 import db.service
+import utils.bytecode
+import utils.limiter
+import utils.metrics
+import utils.reputation
 import utils.web3
+from utils.trace import (
+    CALL_OPCODES,
+    EXTCODE_OPCODES,
+    PROHIBITED_OPCODES,
+    CompactTrace,
+)
 from app.config import settings
 
-PROHIBITED_OPCODES = (
-    "BALANCE",
-    "BASEFEE",
-    "BLOCKHASH",
-    "COINBASE",
-    "CREATE",
-    "DIFFICULTY",
-    "GASLIMIT",
-    "GASPRICE",
-    "NUMBER",
-    "ORIGIN",
-    "PREVRANDAO",
-    "SELFBALANCE",
-    "SELFDESTRUCT",
-    "TIMESTAMP",
+POOL_SIZE_TTL = 1
+
+# Entry point, or None for the whole pool -> time of the count and size,
+# kept up to date with the admissions and evictions of this worker
+pool_sizes = {}
+
+VALIDATION_RESULT_TYPE = (
+    "(uint256,uint256,bool,uint48,uint48,bytes),"
+    "(uint256,uint256),(uint256,uint256),(uint256,uint256)"
 )
+VALIDATION_RESULT_DECODERS = {
+    constants.VALIDATION_RESULT_SIGNATURE: registry.get_decoder(
+        f"({VALIDATION_RESULT_TYPE})"
+    ),
+    constants.VALIDATION_RESULT_WITH_AGGREGATION_SIGNATURE: registry.get_decoder(
+        f"({VALIDATION_RESULT_TYPE},(address,(uint256,uint256)))"
+    ),
+}
 
 
 class SimulationResult:
@@ -41,28 +55,22 @@ class SimulationResult:
         self.paymaster_context: bytes
         self.expires_at: int
         self.aggregator: Optional[str]
-        self.trace: Optional[int]
+        self.trace: Optional[CompactTrace]
         self._set_simulation_result(err_msg, trace)
 
     def _set_simulation_result(self, err_msg: str, trace: list[dict]):
-        self.trace = trace
-
-        types = [
-            "(uint256,uint256,bool,uint48,uint48,bytes)",
-            "(uint256,uint256)",
-            "(uint256,uint256)",
-            "(uint256,uint256)",
-        ]
+        self.trace = CompactTrace(trace) if trace is not None else None
+
         signature = err_msg[2:10].lower()
-        if signature == constants.VALIDATION_RESULT_WITH_AGGREGATION_SIGNATURE:
-            types.append("(address,(uint256,uint256))")
-        elif signature != constants.VALIDATION_RESULT_SIGNATURE:
+        if signature not in VALIDATION_RESULT_DECODERS:
             raise HTTPException(
                 status_code=422,
                 detail=f"The simulation of the UserOp has failed with an "
                 f"error: {err_msg}",
             )
-        decoded = eth_abi.decode(types, bytes.fromhex(err_msg[10:]))
+        decoded = VALIDATION_RESULT_DECODERS[signature](
+            ContextFramesBytesIO(bytes.fromhex(err_msg[10:]))
+        )
         (
             self.pre_op_gas,
             self.prefund,
@@ -131,23 +139,67 @@ async def validate_entry_point(session, entry_point_address):
 
 async def validate_user_op(
     session, user_op, entry_point
-) -> (SimulationResult, bool, hexbytes.HexBytes):
-    initializing, helper_contracts = await validate_before_simulation(
-        session, user_op, entry_point
-    )
-
-    simulation_result = run_simulation(user_op, entry_point)
-    simulation_result.validate()
-    if simulation_result.aggregator:
-        helper_contracts.append(simulation_result.aggregator)
+) -> (
+    SimulationResult,
+    bool,
+    hexbytes.HexBytes,
+    Optional[list[Optional[str]]],
+):
+    with utils.metrics.measure("pre_simulation"):
+        (
+            initializing,
+            helper_contracts,
+            full_pools,
+        ) = await validate_before_simulation(session, user_op, entry_point)
 
     helper_contracts_bytecode_hashes = await validate_helper_contracts(
         session, helper_contracts
     )
-
-    is_trusted = await db.service.all_trusted_bytecodes(
+    trusted_bytecode_hashes = await db.service.get_trusted_bytecode_hashes(
         session, helper_contracts_bytecode_hashes
     )
+    # Only the opcodes of untrusted helper contracts that may reach a
+    # restricted opcode are checked, the rest is simulated without a trace
+    simulation_result = await simulate(
+        user_op,
+        entry_point,
+        trace=await needs_trace(
+            session,
+            helper_contracts,
+            helper_contracts_bytecode_hashes,
+            trusted_bytecode_hashes,
+        ),
+    )
+    simulation_result.validate()
+    if simulation_result.aggregator:
+        helper_contracts.append(simulation_result.aggregator)
+        aggregator_bytecode_hashes = await validate_helper_contracts(
+            session, [simulation_result.aggregator]
+        )
+        helper_contracts_bytecode_hashes += aggregator_bytecode_hashes
+        trusted_bytecode_hashes |= await db.service.get_trusted_bytecode_hashes(
+            session, aggregator_bytecode_hashes
+        )
+        if simulation_result.trace is None and await needs_trace(
+            session,
+            [simulation_result.aggregator],
+            aggregator_bytecode_hashes,
+            trusted_bytecode_hashes,
+        ):
+            simulation_result = await simulate(user_op, entry_point)
+
+    is_trusted = all(
+        bytecode_hash in trusted_bytecode_hashes
+        for bytecode_hash in helper_contracts_bytecode_hashes
+    )
+    untrusted_helper_contracts = [
+        (Web3.toChecksumAddress(address), bytecode_hash)
+        for address, bytecode_hash in zip(
+            helper_contracts, helper_contracts_bytecode_hashes
+        )
+        if bytecode_hash not in trusted_bytecode_hashes
+    ]
+    await validate_reputation(session, untrusted_helper_contracts)
     if not is_trusted:
         await validate_after_simulation(
             session,
@@ -158,10 +210,13 @@ async def validate_user_op(
             initializing,
         )
 
+    utils.reputation.tracker.seen(untrusted_helper_contracts)
+
     return (
         simulation_result,
         is_trusted,
         helper_contracts_bytecode_hashes,
+        full_pools,
     )
 
 
@@ -175,6 +230,21 @@ async def validate_before_simulation(
             detail="UserOp is already in the pool.",
         )
 
+    replaced_user_op = await db.service.get_user_op_by_sender_and_nonce(
+        session, user_op.sender, user_op.nonce
+    )
+    if replaced_user_op is not None:
+        (
+            max_fee_per_gas,
+            max_priority_fee_per_gas,
+        ) = user_op.get_replaceable_fees(settings.min_replacement_fee_bump)
+        if (
+            replaced_user_op.max_fee_per_gas > max_fee_per_gas
+            or replaced_user_op.max_priority_fee_per_gas
+            > max_priority_fee_per_gas
+        ):
+            raise insufficient_fee_bump_exception()
+
     if utils.web3.is_contract(user_op.sender):
         initializing = False
         helper_contracts.append(user_op.sender)
@@ -260,18 +330,57 @@ async def validate_before_simulation(
 
         helper_contracts.append(paymaster_address)
 
-    return initializing, helper_contracts
+    for address in helper_contracts:
+        if (
+            utils.reputation.tracker.get_status(Web3.toChecksumAddress(address))
+            == utils.reputation.BANNED
+        ):
+            raise banned_helper_contract_exception(address)
+
+    # A replacement takes the place of the replaced UserOp
+    full_pools = (
+        await validate_pool_capacity(session, user_op, entry_point.address)
+        if replaced_user_op is None
+        else None
+    )
+
+    return initializing, helper_contracts, full_pools
 
 
-def run_simulation(user_op, entry_point) -> (SimulationResult, int):
-    error_msg, trace = utils.web3.call_simulate_validation(user_op, entry_point)
+def insufficient_fee_bump_exception() -> HTTPException:
+    return HTTPException(
+        status_code=422,
+        detail="The pool already has a UserOp with the same sender and nonce. "
+        "To replace it, 'max_fee_per_gas' and 'max_priority_fee_per_gas' must "
+        f"be increased by at least {settings.min_replacement_fee_bump}%.",
+    )
+
+
+def run_simulation(
+    user_op, entry_point, trace: bool = True
+) -> SimulationResult:
+    with utils.metrics.measure("simulation_rpc"):
+        error_msg, trace = utils.web3.call_simulate_validation(
+            user_op, entry_point, trace=trace
+        )
+    if trace is not None:
+        utils.metrics.observe_trace(trace)
     return SimulationResult(error_msg, trace=trace)
 
 
+async def simulate(
+    user_op, entry_point, trace: bool = True
+) -> SimulationResult:
+    return await utils.limiter.get_simulation_limiter(
+        utils.limiter.TRACE if trace else utils.limiter.CALL
+    ).run(run_simulation, user_op, entry_point, trace=trace)
+
+
 async def validate_helper_contracts(session, helper_contracts) -> list[str]:
-    helper_contracts_bytecode_hashes = [
-        utils.web3.get_bytecode_hash(address) for address in helper_contracts
-    ]
+    with utils.metrics.measure("bytecode_hashing"):
+        helper_contracts_bytecode_hashes = utils.web3.get_bytecode_hashes(
+            helper_contracts
+        )
     if await db.service.any_prohibited_bytecodes(
         session, helper_contracts_bytecode_hashes
     ):
@@ -284,6 +393,169 @@ async def validate_helper_contracts(session, helper_contracts) -> list[str]:
     return helper_contracts_bytecode_hashes
 
 
+async def needs_trace(
+    session, helper_contracts, bytecode_hashes, trusted_bytecode_hashes
+) -> bool:
+    untrusted_helper_contracts = [
+        (address, bytecode_hash)
+        for address, bytecode_hash in zip(helper_contracts, bytecode_hashes)
+        if bytecode_hash not in trusted_bytecode_hashes
+    ]
+    if not untrusted_helper_contracts:
+        return False
+
+    with utils.metrics.measure("bytecode_analysis"):
+        restricted_opcodes = await utils.bytecode.get_restricted_opcodes(
+            session, untrusted_helper_contracts
+        )
+    # Not analyzed bytecodes are None and traced as well
+    return any(opcodes != [] for opcodes in restricted_opcodes.values())
+
+
+async def validate_pool_capacity(
+    session, user_op, entry_point_address: str
+) -> list[Optional[str]]:
+    if (
+        await db.service.count_user_ops(
+            session, settings.max_user_ops_per_sender, sender=user_op.sender
+        )
+        >= settings.max_user_ops_per_sender
+    ):
+        raise HTTPException(
+            status_code=422,
+            detail="The sender already has the maximum number of UserOps in the"
+            f" pool ({settings.max_user_ops_per_sender}).",
+        )
+
+    full_pools = []
+    for entry_point, max_pool_size in get_pools(entry_point_address):
+        if await get_pool_size(session, max_pool_size, entry_point) < (
+            max_pool_size
+        ):
+            continue
+
+        lowest_fee_user_op = await db.service.get_user_op_with_lowest_fee(
+            session, entry_point_address=entry_point
+        )
+        if (
+            lowest_fee_user_op is None
+            or lowest_fee_user_op.max_priority_fee_per_gas
+            >= user_op.max_priority_fee_per_gas
+        ):
+            raise pool_is_full_exception()
+        full_pools.append(entry_point)
+
+    return full_pools
+
+
+def get_pools(entry_point_address: str) -> list[tuple[Optional[str], int]]:
+    return [
+        (None, settings.max_pool_size),
+        (entry_point_address, settings.max_pool_size_per_entry_point),
+    ]
+
+
+async def get_pool_size(
+    session, max_pool_size: int, entry_point_address: Optional[str]
+) -> int:
+    # The count is refreshed at most once a second, in between the worker
+    # adds its own admissions and evictions to it
+    checked_at, pool_size = pool_sizes.get(entry_point_address, (0, 0))
+    if time.monotonic() - checked_at < POOL_SIZE_TTL:
+        return pool_size
+
+    pool_size = await db.service.count_user_ops(
+        session, max_pool_size, entry_point_address=entry_point_address
+    )
+    pool_sizes[entry_point_address] = (time.monotonic(), pool_size)
+    return pool_size
+
+
+def add_to_pool_sizes(entry_point_address: str, count: int):
+    for entry_point in (None, entry_point_address):
+        if entry_point in pool_sizes:
+            checked_at, pool_size = pool_sizes[entry_point]
+            pool_sizes[entry_point] = (checked_at, max(pool_size + count, 0))
+
+
+async def evict_user_ops(
+    session,
+    user_op,
+    entry_point_address: str,
+    full_pools: Optional[list[Optional[str]]],
+):
+    if full_pools is None:
+        return
+
+    if full_pools:
+        await db.service.delete_expired_user_ops(session)
+
+    # One eviction can free a place in both pools, so each pool only loses
+    # UserOps while it is still full
+    for entry_point, max_pool_size in get_pools(entry_point_address):
+        if entry_point not in full_pools:
+            continue
+
+        while (
+            await get_pool_size(session, max_pool_size, entry_point)
+            >= max_pool_size
+        ):
+            lowest_fee_user_op = await db.service.get_user_op_with_lowest_fee(
+                session, entry_point_address=entry_point
+            )
+            if lowest_fee_user_op is None:
+                break
+            if (
+                lowest_fee_user_op.max_priority_fee_per_gas
+                >= user_op.max_priority_fee_per_gas
+            ):
+                raise pool_is_full_exception()
+            await db.service.delete_user_op(session, lowest_fee_user_op)
+            add_to_pool_sizes(lowest_fee_user_op.entry_point, -1)
+
+    add_to_pool_sizes(entry_point_address, 1)
+
+
+def pool_is_full_exception() -> HTTPException:
+    return HTTPException(
+        status_code=422,
+        detail="The pool is full and 'max_priority_fee_per_gas' is not higher "
+        "than that of any UserOp in the pool.",
+    )
+
+
+async def validate_reputation(session, helper_contracts: list[tuple[str, str]]):
+    for address, bytecode_hash in helper_contracts:
+        statuses = {
+            utils.reputation.tracker.get_status(address),
+            utils.reputation.tracker.get_status(bytecode_hash),
+        }
+        if utils.reputation.BANNED in statuses:
+            raise banned_helper_contract_exception(address)
+
+        if (
+            utils.reputation.THROTTLED in statuses
+            and await db.service.count_user_ops_using_bytecode(
+                session, bytecode_hash, settings.throttled_entity_mempool_count
+            )
+            >= settings.throttled_entity_mempool_count
+        ):
+            raise HTTPException(
+                status_code=422,
+                detail=f"The helper contract {address} is throttled due to its "
+                "reputation and the pool already has the maximum number of "
+                "UserOps using it.",
+            )
+
+
+def banned_helper_contract_exception(address: str) -> HTTPException:
+    return HTTPException(
+        status_code=422,
+        detail=f"The helper contract {address} is banned due to its "
+        "reputation.",
+    )
+
+
 async def validate_after_simulation(
     session,
     user_op,
@@ -304,9 +576,10 @@ async def validate_after_simulation(
     if not getattr(simulation_result, "trace", None):
         return
 
-    (helper_contract_index, error_msg) = validate_called_instructions(
-        simulation_result.trace, entry_point, initializing=initializing
-    )
+    with utils.metrics.measure("trace_scan"):
+        (helper_contract_index, error_msg) = validate_called_instructions(
+            simulation_result.trace, entry_point, initializing=initializing
+        )
     if error_msg:
         await db.service.update_bytecode(
             session,
@@ -318,13 +591,14 @@ async def validate_after_simulation(
 
 
 def validate_called_instructions(
-    instructions: list[dict], entry_point: web3.eth.Contract, initializing: bool
+    trace: CompactTrace, entry_point: web3.eth.Contract, initializing: bool
 ) -> (int, str):
     create2_can_be_called = initializing
     helper_contract_number = -1
-    for i in range(len(instructions)):
-        opcode = instructions[i]["op"]
-        if instructions[i]["depth"] == 1:
+    # Only the steps with an opcode the checks below care about are visited
+    for i in trace.flagged_steps:
+        opcode = trace.get_opcode(i)
+        if trace.depths[i] == 1:
             if opcode == "NUMBER":
                 helper_contract_number += 1
             continue
@@ -347,12 +621,7 @@ def validate_called_instructions(
             create2_can_be_called = False
             continue
 
-        if opcode == "GAS" and instructions[i + 1]["op"] not in (
-            "CALL",
-            "DELEGATECALL",
-            "CALLCODE",
-            "STATICCALL",
-        ):
+        if opcode == "GAS" and trace.get_opcode(i + 1) not in CALL_OPCODES:
             return (
                 helper_contract_number,
                 "The UserOp is using the 'GAS' opcode during validation, but "
@@ -363,14 +632,8 @@ def validate_called_instructions(
             create2_can_be_called = False
             continue
 
-        if opcode in (
-            "EXTCODEHASH",
-            "EXTCODESIZE",
-            "EXTCODECOPY",
-        ):
-            target = utils.web3.get_address_from_memory(
-                instructions[i]["stack"][-1]
-            )
+        if opcode in EXTCODE_OPCODES:
+            target = utils.web3.get_address_from_memory(trace.get_stack(i)[-1])
             if not utils.web3.is_contract(target):
                 return (
                     helper_contract_number,
@@ -378,15 +641,8 @@ def validate_called_instructions(
                     "address that does not contain a smart contract.",
                 )
 
-        if opcode in (
-            "CALL",
-            "CALLCODE",
-            "DELEGATECALL",
-            "STATICCALL",
-        ):
-            target = utils.web3.get_address_from_memory(
-                instructions[i]["stack"][-2]
-            )
+        if opcode in CALL_OPCODES:
+            target = utils.web3.get_address_from_memory(trace.get_stack(i)[-2])
             if target == web3.constants.ADDRESS_ZERO or (
                 int(target, 16) > 9  # not a precompiled contract
                 and not utils.web3.is_contract(target)
@@ -399,13 +655,10 @@ def validate_called_instructions(
 
             if target == entry_point.address:
                 bytes_offset_pos = -4 if opcode in ("CALL", "CALLCODE") else -3
-                bytes_offset = int(
-                    instructions[i]["stack"][bytes_offset_pos], 16
-                )
-                memory = "".join(instructions[i]["memory"])
-                selector = memory[bytes_offset * 2 : bytes_offset * 2 + 8]
+                bytes_offset = int(trace.get_stack(i)[bytes_offset_pos], 16)
+                selector = read_memory(trace.get_memory(i), bytes_offset, 4)
                 if selector not in (
-                    entry_point.depositTo.signature[2:],
+                    constants.DEPOSIT_TO_SIGNATURE,
                     "00000000",
                 ):
                     return (
@@ -414,3 +667,11 @@ def validate_called_instructions(
                         "validation, but only 'depositTo' method is allowed.",
                     )
     return None, None
+
+
+def read_memory(memory: list[str], offset: int, size: int) -> str:
+    # Trace memory is a list of 32-byte words in hex, only join the words
+    # that the slice spans
+    first_word, start = divmod(offset, 32)
+    words = "".join(memory[first_word : (offset + size + 31) // 32])
+    return words[start * 2 : (start + size) * 2].ljust(size * 2, "0")
@@ -1,30 +1,66 @@
+import functools
 import json
 import re
 from pathlib import Path
 from typing import Optional
 
 import web3.constants
+from eth_abi.registry import registry
 from web3 import Web3
 from web3.eth import Contract
 
-from app.config import settings
+import app.constants as constants
+import utils.rpc_pool
 
-with open(Path("build") / "contracts" / "EntryPoint.json") as f:
-    entry_point_abi = json.load(f)["abi"]
+SIMULATE_VALIDATION_SELECTOR = bytes(
+    Web3.keccak(text=f"simulateValidation({constants.USER_OP_ABI_TYPE})")[:4]
+)
+SIMULATE_VALIDATION_ENCODER = registry.get_encoder(
+    f"({constants.USER_OP_ABI_TYPE})"
+)
 
-w3 = Web3(Web3.HTTPProvider(settings.rpc_endpoint_uri))
+USER_OPERATION_EVENT_TOPIC = Web3.keccak(
+    text="UserOperationEvent(bytes32,address,address,uint256,bool,uint256,"
+    "uint256)"
+)
+
+EMPTY_BYTECODE_HASH = Web3.keccak(b"").hex()
+
+w3 = Web3(utils.rpc_pool.get_provider())
 last_seen_block = 1
+entry_points = {}
+
+
+@functools.lru_cache(maxsize=None)
+def get_entry_point_abi() -> list[dict]:
+    with open(Path("build") / "contracts" / "EntryPoint.json") as f:
+        return json.load(f)["abi"]
 
 
 def EntryPoint(address) -> Contract:
-    return w3.eth.contract(address=address, abi=entry_point_abi)
+    contract = entry_points.get(address)
+    if contract is None or contract.web3 is not w3:
+        contract = entry_points[address] = w3.eth.contract(
+            address=address, abi=get_entry_point_abi()
+        )
+    return contract
+
+
+def encode_simulate_validation(user_op) -> str:
+    return (
+        "0x"
+        + (
+            SIMULATE_VALIDATION_SELECTOR
+            + SIMULATE_VALIDATION_ENCODER((user_op.values(),))
+        ).hex()
+    )
 
 
 def call_simulate_validation(
-    user_op, entry_point
+    user_op, entry_point, trace: bool = True
 ) -> (str, Optional[list[dict]]):
-    call_data = entry_point.encodeABI("simulateValidation", [user_op.values()])
-    if is_connected_to_testnet():
+    call_data = encode_simulate_validation(user_op)
+    if not trace or is_connected_to_testnet():
         response = w3.provider.make_request(
             "eth_call",
             [
@@ -52,6 +88,16 @@ def call_simulate_validation(
     return response["result"]["returnValue"], response["result"]["structLogs"]
 
 
+def call(from_, to, data) -> (Optional[str], Optional[dict]):
+    response = w3.provider.make_request(
+        "eth_call",
+        [{"from": from_, "to": to, "data": data}, "latest"],
+    )
+    if "error" in response:
+        return None, response["error"]
+    return response["result"], None
+
+
 def estimate_gas(from_, to, data):
     return w3.eth.estimate_gas({"from": from_, "to": to, "data": data})
 
@@ -73,8 +119,82 @@ def get_base_fee():
     )
 
 
-def get_bytecode_hash(address):
-    return Web3.keccak(w3.eth.get_code(address)).hex()
+def get_block_number() -> int:
+    return w3.eth.block_number
+
+
+def get_block_timestamp(block_number: int) -> int:
+    return w3.eth.get_block(block_number)["timestamp"]
+
+
+def get_logs(
+    from_block: int, to_block: int
+) -> (set[str], dict[str, tuple[str, str, bool]]):
+    addresses = set()
+    # UserOp hash -> entry point, transaction hash and success of the UserOps
+    # included in the blocks
+    receipts = {}
+    for log in w3.eth.get_logs({"fromBlock": from_block, "toBlock": to_block}):
+        addresses.add(Web3.toChecksumAddress(log["address"]))
+        for topic in log["topics"][1:]:
+            if topic[:12] == bytes(12):
+                addresses.add(Web3.toChecksumAddress(topic[12:]))
+
+        if log["topics"] and log["topics"][0] == USER_OPERATION_EVENT_TOPIC:
+            # The data is nonce, success, actualGasCost, actualGasUsed
+            data = Web3.toBytes(hexstr=log["data"])
+            receipts["0x" + bytes(log["topics"][1]).hex()] = (
+                Web3.toChecksumAddress(log["address"]),
+                log["transactionHash"].hex(),
+                any(data[32:64]),
+            )
+
+    return addresses, receipts
+
+
+def get_bytecode(address) -> bytes:
+    return bytes(w3.eth.get_code(address))
+
+
+def get_bytecode_hash(address) -> str:
+    return get_bytecode_hashes([address])[0]
+
+
+def get_bytecode_hashes(addresses: list[str]) -> list[str]:
+    if not addresses:
+        return []
+
+    # Executed as creation code, the lookup returns one EXTCODEHASH word per
+    # address, so the node never sends the bytecode itself
+    result = bytes(
+        w3.eth.call({"data": encode_bytecode_hashes_lookup(addresses)})
+    )
+    bytecode_hashes = []
+    for i in range(len(addresses)):
+        bytecode_hash = result[i * 32 : (i + 1) * 32]
+        # EXTCODEHASH of an account that does not exist is 0
+        bytecode_hashes.append(
+            "0x" + bytecode_hash.hex()
+            if any(bytecode_hash)
+            else EMPTY_BYTECODE_HASH
+        )
+    return bytecode_hashes
+
+
+def encode_bytecode_hashes_lookup(addresses: list[str]) -> str:
+    code = b""
+    for i, address in enumerate(addresses):
+        # PUSH20 address, EXTCODEHASH, PUSH2 offset, MSTORE
+        code += (
+            b"\x73"
+            + bytes.fromhex(address[2:])
+            + b"\x3f\x61"
+            + (i * 32).to_bytes(2, "big")
+            + b"\x52"
+        )
+    # PUSH2 size, PUSH1 0, RETURN
+    code += b"\x61" + (len(addresses) * 32).to_bytes(2, "big") + b"\x60\x00\xf3"
+    return "0x" + code.hex()
 
 
 def get_user_op_receipt(
@@ -124,5 +244,4 @@ def is_contract(address) -> bool:
     if address == web3.constants.ADDRESS_ZERO:
         return False
 
-    bytecode = w3.eth.get_code(address)
-    return bool(len(bytecode))
+    return get_bytecode_hash(address) != EMPTY_BYTECODE_HASH